@@ -1,66 +1,414 @@
-from flask import Flask, request, jsonify
-import pickle
+from flask import Flask, request, jsonify, g, Response, stream_with_context
+import json
 import os
-import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from flask_cors import CORS 
-import math
+from model_registry import ModelRegistry, Document, DEFAULT_MODEL
+from result_cache import LRUCache, token_set_key
+from streaming import StreamAccumulator, LineTooLong, MAX_LINE_BYTES, iter_text, iter_sections
+from metrics import (Registry, Counter, Histogram, Gauge, SharedMetrics,
+                     LATENCY_BUCKETS, WORD_BUCKETS, RATIO_BUCKETS)
 
 app = Flask(__name__)
 CORS(app)
+app.config['MAX_BATCH_SIZE'] = int(os.environ.get('CLASSIFY_MAX_BATCH', 1000))
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 10 * 1024 * 1024))
+# /classify/stream lee el cuerpo por bloques, así que admite documentos mucho más grandes
+app.config['STREAM_MAX_CONTENT_LENGTH'] = int(os.environ.get('STREAM_MAX_CONTENT_LENGTH', 1024 ** 3))
+app.config['STREAM_MAX_SECTION_BYTES'] = int(os.environ.get('STREAM_MAX_SECTION_BYTES', MAX_LINE_BYTES))
 
-# Cargar modelo
-model_path = os.path.join(os.path.dirname(__file__), 'bbc_classifier.pkl')
-with open(model_path, 'rb') as f:
-    model_data = pickle.load(f)
-    class_probs = model_data['class_probs']
-    word_probs = model_data['word_probs']
-    vocabulary = set(model_data['vocabulary'])
-    stopwords = model_data['stopwords']
-
-def preprocess_text(text):
-    """Preprocesamiento consistente con el entrenamiento"""
-    text = text.lower()
-    text = re.sub(r'[^a-z\s]', '', text)
-    words = text.split()
-    return [word for word in words if word not in stopwords and len(word) > 2]
+# Registro de modelos (se pueden recargar en caliente sin reiniciar el servidor).
+# MODEL_REGISTRY apunta a un JSON con varios modelos; sin él se sirve solo MODEL_PATH
+memory_budget = os.environ.get('MODEL_MEMORY_BUDGET_MB')
+memory_budget = int(float(memory_budget) * 1024 * 1024) if memory_budget else None
+if os.environ.get('MODEL_REGISTRY'):
+    registry = ModelRegistry.from_config(os.environ['MODEL_REGISTRY'], memory_budget)
+else:
+    model_path = os.environ.get('MODEL_PATH', os.path.join(os.path.dirname(__file__), 'bbc_classifier.pkl'))
+    registry = ModelRegistry({DEFAULT_MODEL: model_path}, memory_budget=memory_budget or 0)
+# El modelo por defecto se carga al arrancar en segundo plano (/readyz indica cuándo
+# está listo; MODEL_LOAD_SYNC=1 lo carga antes de terminar el import). Los demás
+# modelos se cargan con su primera petición
+start_time = time.time()
+if os.environ.get('MODEL_LOAD_SYNC', '').lower() in ('1', 'true'):
+    registry.load_default()
+else:
+    registry.start_loading()
+watch_interval = float(os.environ['MODEL_WATCH_INTERVAL']) if os.environ.get('MODEL_WATCH_INTERVAL') else None
+# serve.py importa la API en el proceso maestro antes del fork (API_PREFORK=1). Un hilo
+# vigilante ahí podría tener tomado un lock del registro justo al hacer fork y dejarlo
+# tomado para siempre en el hijo: en ese caso cada proceso lo inicia en post_fork
+prefork = os.environ.get('API_PREFORK', '').lower() in ('1', 'true')
+if watch_interval and not prefork:
+    registry.start_watching(watch_interval)
+# Procesos que sirven la API (serve.py lo define): con más de uno, /admin/reload
+# llega solo a uno y se propaga a los demás a través de sus vigilantes
+api_workers = int(os.environ.get('API_WORKERS', 1))
 
-@app.route('/classify', methods=['POST'])
-def classify():
-    import math
+# Caché LRU de resultados por modelo (CLASSIFY_CACHE_SIZE=0 la desactiva); cada una
+# se vacía sola cuando cambia la versión de su modelo
+cache_size = int(os.environ.get('CLASSIFY_CACHE_SIZE', 10000))
+result_caches = {}
 
-    data = request.get_json()
-    if not data or 'text' not in data:
-        return jsonify({'error': 'Se requiere texto para clasificar'}), 400
+def result_cache_for(name):
+    return result_caches.setdefault(name, LRUCache(cache_size))
+
+# Puntuación en sombra: un solo hilo, fuera del camino de la respuesta. Si se acumulan
+# más de SHADOW_MAX_PENDING documentos, los nuevos se descartan
+shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shadow')
+shadow_slots = threading.BoundedSemaphore(int(os.environ.get('SHADOW_MAX_PENDING', 1000)))
 
-    text = data['text']
-    tokens = preprocess_text(text)
-    features = {word: 1 if word in vocabulary else 0 for word in tokens}
+# Métricas en formato Prometheus (GET /metrics)
+metrics_registry = Registry()
+REQUESTS_TOTAL = metrics_registry.register(Counter(
+    'api_requests_total', 'Peticiones atendidas por endpoint y código de estado'))
+ERRORS_TOTAL = metrics_registry.register(Counter(
+    'api_errors_total', 'Peticiones con código de estado >= 400 por endpoint'))
+REQUEST_SECONDS = metrics_registry.register(Histogram(
+    'api_request_seconds', 'Duración total de la petición por endpoint', LATENCY_BUCKETS))
+STAGE_SECONDS = metrics_registry.register(Histogram(
+    'classify_stage_seconds', 'Duración de cada etapa de /classify', LATENCY_BUCKETS))
+DOCUMENT_WORDS = metrics_registry.register(Histogram(
+    'classify_document_words', 'Palabras por documento (texto limpio, incluye stopwords)',
+    WORD_BUCKETS))
+OOV_RATIO = metrics_registry.register(Histogram(
+    'classify_oov_ratio', 'Fracción de palabras del documento sin entrada en el vocabulario',
+    RATIO_BUCKETS))
+SHADOW_TOTAL = metrics_registry.register(Counter(
+    'shadow_predictions_total',
+    'Documentos puntuados en sombra por modelo, candidato y resultado '
+    '(agree, disagree, dropped, unloaded, error)'))
+# hit_rate no se exporta: no se puede sumar entre procesos y sale de hits y misses
+metrics_registry.register(Gauge(
+    'classify_cache_stats', 'Estado de la caché de resultados por modelo',
+    lambda: [({'model': name, 'stat': key}, value)
+             for name, cache in list(result_caches.items())
+             for key, value in cache.stats().items() if key != 'hit_rate']))
+metrics_registry.register(Gauge(
+    'model_info', 'Versión de cada modelo cargado (con varios procesos, cuántos la sirven)',
+    lambda: [({'model': name, 'version': info['model_version']}, 1)
+             for name, info in registry.stats()['models'].items() if info['loaded']]))
+metrics_registry.register(Gauge(
+    'model_registry_memory_bytes', 'Memoria estimada de cada modelo cargado',
+    lambda: [({'model': name}, info['memory_bytes'])
+             for name, info in registry.stats()['models'].items() if info['loaded']]))
+metrics_registry.register(Gauge(
+    'model_registry_events', 'Cargas y descargas de modelos del registro',
+    lambda: [({'event': 'loads'}, registry.loads), ({'event': 'evictions'}, registry.evictions)]))
+# Con varios procesos (serve.py) cada uno vuelca sus métricas en METRICS_DIR y
+# /metrics y /cache/stats devuelven la suma de todos
+shared_metrics = SharedMetrics(metrics_registry, os.environ['METRICS_DIR']) \
+    if os.environ.get('METRICS_DIR') else None
 
-    category_scores = {}
+class ModelError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
 
-    for category in class_probs:
-        log_prob = math.log(class_probs[category])
-        for word, count in features.items():
-            if count > 0 and word in word_probs.get(category, {}):
-                log_prob += math.log(word_probs[category][word]) * count
-        category_scores[category] = log_prob
+@app.errorhandler(ModelError)
+def model_error(e):
+    headers = {'Retry-After': '1'} if e.status == 503 else {}
+    return jsonify({'error': str(e)}), e.status, headers
 
-    log_sum = max(category_scores.values())
-    exp_scores = {cat: math.exp(score - log_sum) for cat, score in category_scores.items()}
-    total = sum(exp_scores.values())
-    probs = {cat: round((score / total) * 100, 2) for cat, score in exp_scores.items()}
+def get_model(name):
+    """Handle del modelo pedido (campo "model"); sin nombre, el modelo por defecto"""
+    if name is not None and not isinstance(name, str):
+        raise ModelError('El campo "model" debe ser texto', 400)
+    # El modelo por defecto responde 503 hasta terminar su carga inicial
+    state = registry.readiness() if (name or registry.default) == registry.default else 'ready'
+    if state == 'loading':
+        raise ModelError('El modelo se está cargando', 503)
+    if state == 'failed':
+        raise ModelError(f'No se pudo cargar el modelo: {registry.load_error}', 503)
+    try:
+        return registry.get(name)
+    except KeyError:
+        raise ModelError(f'Modelo desconocido: {name}', 404)
+    except Exception as e:
+        raise ModelError(f'No se pudo cargar el modelo {name}: {str(e)}', 503)
 
-    sorted_probs = sorted(probs.items(), key=lambda x: x[1], reverse=True)
+def score_shadow(primary, candidate, document, primary_category):
+    try:
+        ids, _ = candidate.text_ids_and_count(document)
+        ranking = candidate.model.rank(candidate.model.score_ids(np.unique(ids)))
+        result = 'agree' if ranking[0][0] == primary_category else 'disagree'
+    except Exception as e:
+        print(f"Error en la puntuación en sombra con {candidate.name}: {str(e)}")
+        result = 'error'
+    SHADOW_TOTAL.inc(model=primary, candidate=candidate.name, result=result)
+
+def submit_shadow(handle, document, ranking):
+    """Encola la puntuación del candidato configurado para este modelo, si hay uno"""
+    candidate_name = registry.shadows.get(handle.name)
+    if candidate_name is None:
+        return
+    # Los candidatos se cargan al arrancar: el hilo de sombra nunca carga modelos ni
+    # compite con los principales por la carga o la memoria
+    candidate = registry.loaded(candidate_name)
+    if candidate is None:
+        SHADOW_TOTAL.inc(model=handle.name, candidate=candidate_name, result='unloaded')
+        return
+    if not shadow_slots.acquire(blocking=False):
+        SHADOW_TOTAL.inc(model=handle.name, candidate=candidate_name, result='dropped')
+        return
+    future = shadow_executor.submit(score_shadow, handle.name, candidate, document,
+                                    ranking[0][0])
+    future.add_done_callback(lambda _: shadow_slots.release())
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    endpoint = request.endpoint or 'unknown'
+    start = getattr(g, 'request_start', None)
+    if start is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+    REQUESTS_TOTAL.inc(endpoint=endpoint, status=response.status_code)
+    if response.status_code >= 400:
+        ERRORS_TOTAL.inc(endpoint=endpoint)
+    return response
+
+@app.route('/classify', methods=['POST'])
+def classify():
+    with STAGE_SECONDS.time(stage='parse'):
+        data = request.get_json()
+    if not data or 'text' not in data:
+        return jsonify({'error': 'Se requiere texto para clasificar'}), 400
+
+    # Una sola referencia al modelo durante toda la petición
+    handle = get_model(data.get('model'))
+    model = handle.model
+    with STAGE_SECONDS.time(stage='preprocess'):
+        # Tokenización compartida: la puntuación en sombra reutiliza el documento
+        document = Document(data['text'], registry.vocabulary)
+        known_ids, n_words = handle.text_ids_and_count(document)
+        # Cada palabra del vocabulario cuenta una sola vez (presencia)
+        ids = list(set(known_ids))
+    DOCUMENT_WORDS.observe(n_words)
+    if n_words:
+        OOV_RATIO.observe(1 - len(known_ids) / n_words)
+
+    with STAGE_SECONDS.time(stage='score'):
+        # Documentos con el mismo conjunto de palabras comparten resultado
+        cache_key = token_set_key(ids)
+        result_cache = result_cache_for(handle.name)
+        sorted_probs = result_cache.get(model.version, cache_key)
+        if sorted_probs is None:
+            scores = model.score_ids(ids)
+            sorted_probs = model.rank(scores)
+            result_cache.put(model.version, cache_key, sorted_probs)
+    submit_shadow(handle, document, sorted_probs)
 
     result = {
         "categories": [
             {"category": cat, "confidence": conf}
             for cat, conf in sorted_probs
         ],
+        "model": handle.name,
+        "model_version": model.version,
         "status": "success"
     }
 
-    return jsonify(result)
+    with STAGE_SECONDS.time(stage='serialize'):
+        response = jsonify(result)
+    return response
+
+@app.route('/classify/batch', methods=['POST'])
+def classify_batch():
+    data = request.get_json()
+    if not data or not isinstance(data.get('documents'), list):
+        return jsonify({'error': 'Se requiere una lista de documentos para clasificar'}), 400
+
+    documents = data['documents']
+    max_batch = app.config['MAX_BATCH_SIZE']
+    if len(documents) > max_batch:
+        return jsonify({'error': f'El lote excede el máximo de {max_batch} documentos'}), 413
+
+    # Matriz documento-término dispersa (CSR) con presencia de cada palabra
+    handle = get_model(data.get('model'))
+    model = handle.model
+    indptr = [0]
+    indices = []
+    for doc in documents:
+        text = doc.get('text') if isinstance(doc, dict) else doc
+        if not isinstance(text, str):
+            return jsonify({'error': 'Cada documento debe ser texto o un objeto con "text"'}), 400
+        ids = set(handle.text_ids_and_count(Document(text, registry.vocabulary))[0])
+        indices.extend(ids)
+        indptr.append(len(indices))
+
+    scores = model.score_csr(indptr, indices, [1.0] * len(indices))
+
+    results = []
+    for doc, doc_scores in zip(documents, scores):
+        item = {
+            "categories": [
+                {"category": cat, "confidence": conf}
+                for cat, conf in model.rank(doc_scores)
+            ]
+        }
+        if isinstance(doc, dict) and 'id' in doc:
+            item["id"] = doc['id']
+        results.append(item)
+
+    return jsonify({"results": results, "model": handle.name, "model_version": model.version,
+                    "status": "success"})
+
+def ranking_json(ranking):
+    return [{"category": cat, "confidence": conf} for cat, conf in ranking]
+
+@app.route('/classify/stream', methods=['POST'])
+def classify_stream():
+    """Clasifica cuerpos grandes sin cargarlos completos en memoria.
+    text/plain: un solo documento. application/x-ndjson: una sección por línea;
+    con ?sections=1 responde NDJSON con una línea por sección y una final con el total"""
+    # Flask >= 3.1: límite propio para esta petición
+    request.max_content_length = app.config['STREAM_MAX_CONTENT_LENGTH']
+    handle = get_model(request.args.get('model'))
+    model = handle.model
+    per_section = request.args.get('sections', '').lower() in ('1', 'true')
+    is_ndjson = request.mimetype in ('application/x-ndjson', 'application/jsonl')
+
+    if per_section and not is_ndjson:
+        return jsonify({'error': 'sections=1 requiere un cuerpo application/x-ndjson'}), 400
+
+    total = StreamAccumulator(model)
+    max_section = app.config['STREAM_MAX_SECTION_BYTES']
+
+    if not is_ndjson:
+        for text in iter_text(request.stream):
+            total.add_text(text)
+        return jsonify({"categories": ranking_json(total.ranking()), "model": handle.name,
+                        "model_version": model.version, "status": "success"})
+
+    if not per_section:
+        try:
+            sections = 0
+            for item in iter_sections(request.stream, max_line=max_section):
+                total.add_text(item['text'])
+                sections += 1
+        except LineTooLong as e:
+            return jsonify({'error': str(e)}), 413
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({"categories": ranking_json(total.ranking()), "sections": sections,
+                        "model": handle.name, "model_version": model.version,
+                        "status": "success"})
+
+    def generate():
+        sections = 0
+        try:
+            for item in iter_sections(request.stream, max_line=max_section):
+                section = StreamAccumulator(model)
+                section.add_text(item['text'])
+                total.merge(section)
+                sections += 1
+
+                line = {"section": sections, "categories": ranking_json(section.ranking())}
+                if 'id' in item:
+                    line["id"] = item['id']
+                yield json.dumps(line) + '\n'
+        except LineTooLong as e:
+            # La respuesta ya empezó con 200: el código va en la última línea
+            yield json.dumps({"error": str(e), "code": 413, "status": "error"}) + '\n'
+            return
+        except ValueError as e:
+            yield json.dumps({"error": str(e), "status": "error"}) + '\n'
+            return
+
+        yield json.dumps({"section": "total", "categories": ranking_json(total.ranking()),
+                          "sections": sections, "model": handle.name,
+                          "model_version": model.version, "status": "success"}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: el proceso responde, aunque el modelo todavía se esté cargando"""
+    return jsonify({"status": "ok", "model_state": registry.readiness(),
+                    "uptime_seconds": round(time.time() - start_time, 3)})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: 200 solo cuando el modelo por defecto está cargado y validado"""
+    state = registry.readiness()
+    if state != 'ready':
+        body = {"status": state, "model": registry.default}
+        if state == 'failed':
+            body["error"] = registry.load_error
+        return jsonify(body), 503
+    return jsonify({"status": "ready", "model": registry.default,
+                    "model_version": registry.get().version,
+                    "load_seconds": (None if registry.load_seconds is None
+                                     else round(registry.load_seconds, 4))})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    body = shared_metrics.render() if shared_metrics else metrics_registry.render()
+    return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Estado de la caché de un modelo (?model=nombre, por defecto el principal)"""
+    name = request.args.get('model') or registry.default
+    if name not in registry.paths:
+        return jsonify({'error': f'Modelo desconocido: {name}'}), 404
+    stats = result_cache_for(name).stats()
+    if shared_metrics:
+        # Suma de las cachés de todos los procesos; max_size es el de cada proceso
+        max_size = stats['max_size']
+        stats = dict.fromkeys(stats, 0)
+        for key, value in shared_metrics.series('classify_cache_stats'):
+            labels = dict(key)
+            if labels['model'] == name:
+                stats[labels['stat']] += value
+        stats['max_size'] = max_size
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    return jsonify(stats)
+
+@app.route('/models', methods=['GET'])
+def list_models():
+    return jsonify(registry.stats())
+
+@app.route('/admin/reload', methods=['POST'])
+def reload_model():
+    admin_token = os.environ.get('ADMIN_TOKEN')
+    # En producción (serve.py) el endpoint queda expuesto: sin token no se permite
+    if not admin_token and prefork:
+        return jsonify({'error': 'Recarga deshabilitada: defina ADMIN_TOKEN'}), 403
+    if admin_token and request.headers.get('X-Admin-Token') != admin_token:
+        return jsonify({'error': 'No autorizado'}), 403
+
+    data = request.get_json(silent=True) or {}
+    name = data.get('model') or request.args.get('model') or registry.default
+    if name not in registry.paths:
+        return jsonify({'error': f'Modelo desconocido: {name}'}), 404
+
+    previous = registry.stats()['models'][name]['model_version']
+    broadcast = api_workers > 1
+    if broadcast and not watch_interval:
+        return jsonify({'error': 'Con varios procesos la recarga requiere MODEL_WATCH_INTERVAL'}), 409
+    try:
+        if broadcast:
+            # Antes de recargar aquí: así este proceso registra la fecha nueva y no repite
+            registry.mark_changed(name)
+        version = registry.reload(name)
+    except Exception as e:
+        return jsonify({'error': f'No se pudo recargar el modelo: {str(e)}',
+                        'model': name, 'model_version': previous}), 500
+
+    body = {"model": name, "previous_version": previous, "model_version": version,
+            "status": "success", "workers": api_workers}
+    if broadcast:
+        # Este proceso ya recargó; los demás lo hacen en su próxima revisión
+        body["propagation_seconds"] = watch_interval
+    return jsonify(body)
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
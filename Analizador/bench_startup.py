@@ -0,0 +1,146 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ANALIZADOR_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(ANALIZADOR_DIR)
+DEFAULT_MODEL = os.path.join(ANALIZADOR_DIR, 'bbc_classifier.pkl')
+# Módulos que se importan solos desde la línea de comandos o desde otros módulos
+IMPORT_MODULES = ['api', 'evaluate_model', 'train_model', 'classify_bulk', 'compact_model', 'sweep']
+# Dependencias pesadas que solo deben cargarse cuando se usan
+HEAVY_MODULES = ['matplotlib', 'seaborn', 'sklearn']
+SAMPLE_TEXTS = [
+    "The government announced new election plans after the minister met party leaders.",
+    "The striker scored twice as the club won the league match on Saturday night.",
+]
+
+# Cada medición corre en un intérprete nuevo: la caché de módulos no se comparte
+IMPORT_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {path!r})
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"import_s": seconds, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+API_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {path!r})
+start = time.perf_counter()
+import api
+imported = time.perf_counter()
+client = api.app.test_client()
+while client.get('/readyz').status_code != 200:
+    if api.registry.readiness() == 'failed':
+        raise SystemExit(api.registry.load_error)
+    time.sleep(0.001)
+ready = time.perf_counter()
+first = client.post('/classify', json={{'text': {first!r}}})
+first_done = time.perf_counter()
+client.post('/classify', json={{'text': {second!r}}})
+second_done = time.perf_counter()
+if first.status_code != 200:
+    raise SystemExit(f"/classify respondió {{first.status_code}}")
+print(json.dumps({{"import_s": imported - start, "ready_s": ready - start,
+                  "first_request_s": first_done - ready,
+                  "second_request_s": second_done - first_done}}))
+"""
+
+def run_script(script, env=None):
+    """Ejecuta el script en un proceso nuevo; devuelve su JSON y la duración total"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", script], cwd=REPO_DIR, env=env,
+                            capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or result.stdout.strip())
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    data['process_s'] = wall
+    return data
+
+def summarize(runs):
+    """Mediana y mínimo de cada medición numérica"""
+    keys = [key for key, value in runs[0].items() if isinstance(value, float)]
+    return {key: {'median': statistics.median(run[key] for run in runs),
+                  'min': min(run[key] for run in runs)} for key in keys}
+
+def api_env(model_path, sync=False):
+    env = dict(os.environ, MODEL_PATH=model_path)
+    env.pop('MODEL_REGISTRY', None)
+    env.pop('MODEL_WATCH_INTERVAL', None)
+    env['MODEL_LOAD_SYNC'] = '1' if sync else '0'
+    return env
+
+def bench_imports(model_path, repeat):
+    baseline = [run_script("print('{}')") for _ in range(repeat)]
+    results = {'python': summarize(baseline)}
+    print(f"\n{'Módulo':<18} {'Import (med)':>13} {'Import (mín)':>13} {'Proceso':>10}  Pesados")
+    print(f"{'(intérprete)':<18} {'':>13} {'':>13} "
+          f"{results['python']['process_s']['median'] * 1000:>8.0f}ms")
+    for module in IMPORT_MODULES:
+        script = IMPORT_SCRIPT.format(path=ANALIZADOR_DIR, module=module, heavy=HEAVY_MODULES)
+        runs = [run_script(script, api_env(model_path)) for _ in range(repeat)]
+        stats = summarize(runs)
+        heavy = sorted({name for run in runs for name in run['heavy']})
+        results[module] = {**stats, 'heavy': heavy}
+        print(f"{module:<18} {stats['import_s']['median'] * 1000:>11.1f}ms "
+              f"{stats['import_s']['min'] * 1000:>11.1f}ms "
+              f"{stats['process_s']['median'] * 1000:>8.0f}ms  {', '.join(heavy) or '-'}")
+    return results
+
+def bench_api(cases, repeat):
+    script = API_SCRIPT.format(path=ANALIZADOR_DIR, first=SAMPLE_TEXTS[0], second=SAMPLE_TEXTS[1])
+    results = {}
+    print(f"\n{'Arranque de la API':<28} {'Import':>9} {'Listo':>9} {'1ª petición':>12} "
+          f"{'2ª petición':>12} {'Proceso':>9}")
+    for name, model_path, sync in cases:
+        stats = summarize([run_script(script, api_env(model_path, sync)) for _ in range(repeat)])
+        results[name] = stats
+        print(f"{name:<28} {stats['import_s']['median'] * 1000:>7.1f}ms "
+              f"{stats['ready_s']['median'] * 1000:>7.1f}ms "
+              f"{stats['first_request_s']['median'] * 1000:>10.2f}ms "
+              f"{stats['second_request_s']['median'] * 1000:>10.2f}ms "
+              f"{stats['process_s']['median'] * 1000:>7.0f}ms")
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Tiempo de arranque: imports, carga del modelo y primera petición")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="modelo .pkl a medir")
+    parser.add_argument("--repeat", type=int, default=5, help="procesos por medición (mediana)")
+    parser.add_argument("--output", help="guarda los resultados en JSON")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    sys.path.insert(0, ANALIZADOR_DIR)
+    from compiled_model import export_mmap, load_model
+
+    print("----------------ARRANQUE EN FRÍO----------------")
+    model_path = os.path.abspath(args.model)
+    results = {'imports': bench_imports(model_path, args.repeat)}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cases = [("pickle", model_path, False), ("pickle (carga síncrona)", model_path, True)]
+        try:
+            # Ruta precompilada: arreglos .npy abiertos con mmap, sin deserializar
+            mmap_path = os.path.join(tmp_dir, 'model.mmap')
+            export_mmap(load_model(model_path), mmap_path)
+            cases.append(("mmap", mmap_path, False))
+        except ValueError as e:
+            print(f"\n(sin caso mmap: {str(e)})")
+        results['api'] = bench_api(cases, args.repeat)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResultados guardados en: {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import glob
+import os
+import re
+import timeit
+from tokenizer import STOPWORDS, tokenize, token_ids
+
+NEWS_PATH = os.path.join("DataSet", "BBC News Summary", "BBC News Summary", "News Articles")
+
+def legacy_preprocess(text):
+    """Ruta anterior: lower() + re.sub + split() + comprensión de lista"""
+    text = text.lower()
+    text = re.sub(r'[^a-z\s]', '', text)
+    words = text.split()
+    return [word for word in words
+            if word not in STOPWORDS
+            and len(word) > 2
+            and word.isalpha()]
+
+def legacy_ids(text, word_index):
+    return [word_index[word] for word in legacy_preprocess(text) if word in word_index]
+
+def build_long_articles(n_docs, articles_per_doc):
+    """Concatena artículos del dataset para simular documentos largos"""
+    articles = []
+    for file_path in sorted(glob.glob(os.path.join(NEWS_PATH, "**", "*.txt"), recursive=True)):
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            articles.append(f.read())
+    if not articles:
+        raise SystemExit(f"No se encontraron artículos en {NEWS_PATH}")
+
+    docs = []
+    for i in range(n_docs):
+        start = (i * articles_per_doc) % len(articles)
+        chunk = [articles[(start + j) % len(articles)] for j in range(articles_per_doc)]
+        docs.append("\n".join(chunk))
+    return docs
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark del tokenizador compartido")
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--articles-per-doc", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    docs = build_long_articles(args.docs, args.articles_per_doc)
+    vocabulary = {word for doc in docs for word in tokenize(doc)}
+    word_index = {word: idx for idx, word in enumerate(sorted(vocabulary))}
+
+    # Verificar que ambas rutas producen exactamente lo mismo
+    for doc in docs:
+        if legacy_preprocess(doc) != tokenize(doc):
+            raise SystemExit("ERROR: el tokenizador no coincide con la ruta anterior")
+        if legacy_ids(doc, word_index) != token_ids(doc, word_index):
+            raise SystemExit("ERROR: los índices no coinciden con la ruta anterior")
+
+    total_mb = sum(len(doc) for doc in docs) / 1e6
+    cases = [
+        ("tokens (anterior)", lambda: [legacy_preprocess(doc) for doc in docs]),
+        ("tokens (tokenizer)", lambda: [tokenize(doc) for doc in docs]),
+        ("ids (anterior)", lambda: [legacy_ids(doc, word_index) for doc in docs]),
+        ("ids (tokenizer)", lambda: [token_ids(doc, word_index) for doc in docs]),
+    ]
+
+    print(f"----------------TOKENIZADOR ({args.docs} docs, {total_mb:.1f} MB)----------------")
+    results = {}
+    for name, func in cases:
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        results[name] = best
+        print(f"{name:<22} {best * 1000:>9.1f} ms  {total_mb / best:>7.1f} MB/s")
+
+    print(f"\nAceleración tokens: {results['tokens (anterior)'] / results['tokens (tokenizer)']:.2f}x")
+    print(f"Aceleración ids:    {results['ids (anterior)'] / results['ids (tokenizer)']:.2f}x")
+
+if __name__ == '__main__':
+    main()
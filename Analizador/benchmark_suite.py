@@ -0,0 +1,309 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import string
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+import numpy as np
+
+from preprocess_bbc_dataset import CATEGORIES, process_category_files, prepare_ml_datasets
+from sparse_dataset import from_features, save_sparse_dataset
+from tokenizer import STOPWORDS
+from naive_bayes import NaiveBayesClassifier
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# ---------------- Corpus sintético ----------------
+
+def generate_vocabulary(rng, vocab_size):
+    """Palabras alfabéticas aleatorias (4-10 letras) que no son stopwords"""
+    letters = np.array(list(string.ascii_lowercase))
+    words = set()
+    while len(words) < vocab_size:
+        length = int(rng.integers(4, 11))
+        word = ''.join(rng.choice(letters, size=length))
+        if word not in STOPWORDS:
+            words.add(word)
+    return sorted(words)
+
+def category_distributions(rng, vocab_size, n_categories, topic_weight=0.3):
+    """Zipf global mezclada con una Zipf propia de cada categoría"""
+    zipf = 1.0 / np.arange(1, vocab_size + 1)
+    zipf /= zipf.sum()
+    base = zipf[rng.permutation(vocab_size)]
+
+    distributions = []
+    for _ in range(n_categories):
+        topic = zipf[rng.permutation(vocab_size)]
+        distributions.append((1 - topic_weight) * base + topic_weight * topic)
+    return distributions
+
+def generate_corpus(root, n_docs, vocab_size, doc_len, seed=42, batch_size=1000):
+    """Escribe un corpus estilo BBC: <root>/<categoría>/<n>.txt"""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(generate_vocabulary(rng, vocab_size))
+    distributions = category_distributions(rng, vocab_size, len(CATEGORIES))
+
+    for category in CATEGORIES:
+        os.makedirs(os.path.join(root, category), exist_ok=True)
+
+    total_tokens = 0
+    for start in range(0, n_docs, batch_size):
+        count = min(batch_size, n_docs - start)
+        categories = rng.integers(0, len(CATEGORIES), size=count)
+        lengths = np.maximum(10, rng.poisson(doc_len, size=count))
+
+        for offset, (cat_idx, length) in enumerate(zip(categories, lengths)):
+            ids = rng.choice(vocab_size, size=length, p=distributions[cat_idx])
+            words = vocabulary[ids]
+            # Oraciones de 12 palabras con puntuación, como un artículo
+            sentences = [' '.join(words[i:i + 12]).capitalize() + '.'
+                         for i in range(0, length, 12)]
+            path = os.path.join(root, CATEGORIES[cat_idx], f"{start + offset:07d}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(' '.join(sentences))
+            total_tokens += int(length)
+
+    return total_tokens
+
+# ---------------- Medición ----------------
+
+class PeakMemory:
+    """Muestrea el RSS del proceso en un hilo para obtener el pico de una etapa.
+    A diferencia de tracemalloc no frena el código medido. Requiere /proc (Linux)"""
+
+    STATM = "/proc/self/statm"
+
+    def __init__(self, enabled=True, interval=0.005):
+        self.enabled = enabled and os.path.exists(self.STATM)
+        self.interval = interval
+        self.start_rss = None
+        self.peak_rss = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _rss(self):
+        with open(self.STATM) as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, self._rss())
+
+    def __enter__(self):
+        if self.enabled:
+            self.start_rss = self.peak_rss = self._rss()
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.enabled:
+            self._stop.set()
+            self._thread.join()
+            self.peak_rss = max(self.peak_rss, self._rss())
+
+    def stats(self):
+        if not self.enabled:
+            return {'peak_rss_mb': None, 'rss_delta_mb': None}
+        return {'peak_rss_mb': round(self.peak_rss / 1e6, 2),
+                'rss_delta_mb': round((self.peak_rss - self.start_rss) / 1e6, 2)}
+
+def measure(name, func, items, unit, track_memory=True):
+    """Ejecuta una etapa y registra tiempo, memoria pico y throughput"""
+    with PeakMemory(track_memory) as memory:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = func()
+        wall = time.perf_counter() - start
+
+    n_items = items(result) if callable(items) else items
+    stats = {
+        'wall_s': round(wall, 4),
+        **memory.stats(),
+        'items': n_items,
+        'throughput': round(n_items / wall, 2) if wall > 0 else None,
+        'unit': unit,
+    }
+    delta = stats['rss_delta_mb']
+    memory_text = f"{delta:>+9.1f} MB" if delta is not None else "        - MB"
+    print(f"{name:<20} {wall:>9.3f} s {memory_text} {stats['throughput']:>14,.1f} {unit}/s")
+    return result, stats
+
+def classify_latencies(model_path, texts, track_memory):
+    """Latencias de POST /classify con el cliente de pruebas de Flask"""
+    os.environ['MODEL_PATH'] = model_path
+    os.environ['CLASSIFY_CACHE_SIZE'] = '0'  # medir la clasificación, no la caché
+    sys.modules.pop('api', None)
+    import api
+    if not api.registry.wait_ready():
+        raise RuntimeError(f"No se pudo cargar el modelo: {api.registry.load_error}")
+
+    client = api.app.test_client()
+    latencies = []
+    with PeakMemory(track_memory) as memory:
+        start = time.perf_counter()
+        for text in texts:
+            t0 = time.perf_counter()
+            response = client.post('/classify', json={'text': text})
+            latencies.append(time.perf_counter() - t0)
+            if response.status_code != 200:
+                raise RuntimeError(f"/classify respondió {response.status_code}")
+        wall = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    stats = {
+        'wall_s': round(wall, 4),
+        **memory.stats(),
+        'items': len(texts),
+        'throughput': round(len(texts) / wall, 2),
+        'unit': 'requests',
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 3),
+    }
+    print(f"{'/classify':<20} p50 {stats['p50_ms']:.2f} ms  p95 {stats['p95_ms']:.2f} ms  "
+          f"p99 {stats['p99_ms']:.2f} ms  ({stats['throughput']:,.1f} requests/s)")
+    return stats
+
+def run_scale(work_dir, n_docs, vocab_size, doc_len, workers, requests, seed, track_memory):
+    import train_model
+    import evaluate_model
+    from compiled_model import load_model
+
+    corpus_dir = os.path.join(work_dir, "corpus")
+    data_dir = os.path.join(work_dir, "preprocessed")
+    model_path = os.path.join(work_dir, "model.pkl")
+    os.makedirs(data_dir, exist_ok=True)
+    stages = {}
+
+    print(f"\n--- {n_docs:,} docs, vocabulario {vocab_size:,}, ~{doc_len} palabras/doc ---")
+    start = time.perf_counter()
+    total_tokens = generate_corpus(corpus_dir, n_docs, vocab_size, doc_len, seed)
+    print(f"Corpus generado en {time.perf_counter() - start:.1f} s ({total_tokens:,} palabras)")
+
+    category_data, stages['ingestion'] = measure(
+        "ingestión", lambda: process_category_files(corpus_dir, CATEGORIES, workers),
+        n_docs, "docs", track_memory)
+
+    def prepare():
+        vocabulary, train_set, test_set = prepare_ml_datasets(category_data)
+        save_sparse_dataset(os.path.join(data_dir, "train_dataset.npz"),
+                            from_features(vocabulary, train_set))
+        save_sparse_dataset(os.path.join(data_dir, "test_dataset.npz"),
+                            from_features(vocabulary, test_set))
+        return len(train_set) + len(test_set)
+
+    n_rows, stages['dataset_build'] = measure(
+        "construcción dataset", prepare, lambda n: n, "rows", track_memory)
+    del category_data
+
+    (train_data, _), stages['dataset_load'] = measure(
+        "carga dataset", lambda: train_model.load_dataset("train_dataset.npz", data_dir),
+        lambda result: len(result[0]), "rows", track_memory)
+
+    def train():
+        classifier = NaiveBayesClassifier()
+        classifier.train(train_data)
+        train_model.save_model(classifier, model_path)
+        return classifier
+
+    _, stages['train'] = measure("entrenamiento", train, len(train_data), "rows", track_memory)
+    del train_data
+
+    def evaluate():
+        model = load_model(model_path)
+        features, labels, vocabulary = evaluate_model.load_dataset("test_dataset.npz", data_dir)
+        return evaluate_model.predict_with_model(features, vocabulary, model)
+
+    _, stages['batch_evaluation'] = measure(
+        "evaluación en lote", evaluate, len, "rows", track_memory)
+
+    # Peticiones con documentos completos del corpus sintético
+    texts = []
+    for category in CATEGORIES:
+        category_dir = os.path.join(corpus_dir, category)
+        for name in sorted(os.listdir(category_dir))[:max(1, requests // len(CATEGORIES))]:
+            with open(os.path.join(category_dir, name), encoding="utf-8") as f:
+                texts.append(f.read())
+    stages['classify_latency'] = classify_latencies(model_path, texts, track_memory)
+
+    return {
+        'config': {'docs': n_docs, 'vocab_size': vocab_size, 'doc_len': doc_len,
+                   'workers': workers, 'seed': seed, 'tokens': total_tokens,
+                   'dataset_rows': n_rows},
+        'stages': stages,
+    }
+
+def compare(previous_path, results):
+    """Imprime la razón de tiempos contra una corrida anterior (>1 = más lento)"""
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    previous_runs = {run['config']['docs']: run for run in previous['runs']}
+
+    print("\n----------------COMPARACIÓN----------------")
+    for run in results['runs']:
+        old = previous_runs.get(run['config']['docs'])
+        if old is None:
+            continue
+        print(f"{run['config']['docs']:,} docs:")
+        for stage, stats in run['stages'].items():
+            old_stats = old['stages'].get(stage)
+            if old_stats and old_stats['wall_s']:
+                ratio = stats['wall_s'] / old_stats['wall_s']
+                print(f"  {stage:<20} {old_stats['wall_s']:>9.3f} s -> {stats['wall_s']:>9.3f} s  ({ratio:.2f}x)")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de todas las etapas del pipeline")
+    parser.add_argument("--docs", type=int, nargs="+", default=[10000],
+                        help="escalas a medir (número de documentos), p. ej. 10000 100000 1000000")
+    parser.add_argument("--vocab-size", type=int, default=20000)
+    parser.add_argument("--doc-len", type=int, default=300, help="palabras promedio por documento")
+    parser.add_argument("--workers", type=int, default=1, help="procesos para la ingestión")
+    parser.add_argument("--requests", type=int, default=500, help="peticiones a /classify")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-memory", action="store_true",
+                        help="no muestrear la memoria (RSS) durante las etapas")
+    parser.add_argument("--work-dir", help="directorio de trabajo (por defecto uno temporal)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    print("----------------BENCHMARK DEL PIPELINE----------------")
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpu_count': os.cpu_count(), 'numpy': np.__version__},
+        'runs': [],
+    }
+
+    base_dir = args.work_dir or tempfile.mkdtemp(prefix="bbc_bench_")
+    try:
+        for n_docs in args.docs:
+            work_dir = os.path.join(base_dir, f"docs_{n_docs}")
+            results['runs'].append(run_scale(work_dir, n_docs, args.vocab_size, args.doc_len,
+                                             args.workers, args.requests, args.seed,
+                                             not args.no_memory))
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResultados guardados en: {args.output}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+if __name__ == '__main__':
+    main()
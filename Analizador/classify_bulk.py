@@ -0,0 +1,274 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+import numpy as np
+from model_store import ModelStore
+
+DEFAULT_MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bbc_classifier.pkl')
+BATCH_SIZE = 256
+PROGRESS_EVERY = 10000  # Documentos entre mensajes de progreso
+
+# ---------------- Entrada ----------------
+# Cada registro es (id, texto, ruta): con ruta, el proceso que clasifica lee el archivo
+
+def iter_directory(root, extension=".txt"):
+    """Archivos del árbol en orden estable; el id es la ruta relativa"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.endswith(extension):
+                path = os.path.join(dirpath, name)
+                yield os.path.relpath(path, root), None, path
+
+def iter_jsonl(path):
+    """Líneas con texto o {"id", "text"}; el id por defecto es el número de línea.
+    Las líneas inválidas se conservan para que el resultado tenga un registro por línea"""
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                yield number, ValueError("JSON inválido"), None
+                continue
+            if isinstance(item, str):
+                item = {'text': item}
+            if not isinstance(item, dict) or not isinstance(item.get('text'), str):
+                yield number, ValueError('se esperaba texto o un objeto con "text"'), None
+                continue
+            yield item.get('id', number), item['text'], None
+
+def iter_csv(path, text_column="text", id_column="id"):
+    csv.field_size_limit(sys.maxsize)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        if text_column not in (reader.fieldnames or []):
+            raise ValueError(f"El CSV no tiene la columna '{text_column}'")
+        for number, row in enumerate(reader, 1):
+            yield row.get(id_column) or number, row[text_column], None
+
+def iter_input(path, input_format, text_column, id_column):
+    if input_format == 'dir':
+        return iter_directory(path)
+    if input_format == 'jsonl':
+        return iter_jsonl(path)
+    return iter_csv(path, text_column, id_column)
+
+def detect_format(path):
+    if os.path.isdir(path):
+        return 'dir'
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension == '.csv':
+        return 'csv'
+    raise ValueError(f"No se reconoce el formato de {path}; usa --input-format")
+
+def iter_batches(records, batch_size):
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield batch
+
+# ---------------- Clasificación (procesos del pool) ----------------
+
+_worker = {}
+
+def init_worker(model_path):
+    # Mismo cargador y validación que la API
+    store = ModelStore(model_path)
+    store.reload()
+    _worker['model'] = store.current()
+
+def rank_texts(model, texts):
+    """Igual que /classify (cada palabra del vocabulario cuenta una vez), pero todo el
+    lote se puntúa con un solo score_csr"""
+    id_sets = [np.unique(np.asarray(model.text_ids(text), dtype=np.intp)) for text in texts]
+    indptr = np.concatenate(([0], np.cumsum([len(ids) for ids in id_sets])))
+    indices = np.concatenate(id_sets) if id_sets else np.empty(0, dtype=np.intp)
+    scores = model.score_csr(indptr, indices, np.ones(len(indices)))
+    return [model.rank(row) for row in scores]
+
+def read_text(path):
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+def classify_batch(batch):
+    """Devuelve la versión y categorías del modelo y un resultado por registro, en el
+    mismo orden: (id, ranking o mensaje de error)"""
+    model = _worker['model']
+    texts = []
+    errors = {}
+    for position, (_, text, path) in enumerate(batch):
+        if isinstance(text, Exception):
+            errors[position] = str(text)
+            text = ''
+        elif path is not None:
+            try:
+                text = read_text(path)
+            except OSError as e:
+                errors[position] = str(e)
+                text = ''
+        texts.append(text)
+
+    rankings = rank_texts(model, texts)
+    results = [(record_id, errors.get(position, ranking))
+               for position, ((record_id, _, _), ranking) in enumerate(zip(batch, rankings))]
+    return model.version, model.categories, results
+
+def classify_records(records, model_path, workers=1, batch_size=BATCH_SIZE):
+    """Genera (versión, categorías, [(id, resultado)]) por lote, en orden. Con workers > 1
+    solo hay unos pocos lotes en vuelo por proceso: la entrada se lee a medida que avanza"""
+    batches = iter_batches(records, batch_size)
+    if workers <= 1:
+        init_worker(model_path)
+        for batch in batches:
+            yield classify_batch(batch)
+        return
+
+    with Pool(workers, initializer=init_worker, initargs=(model_path,)) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.apply_async(classify_batch, (batch,)))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+# ---------------- Salida ----------------
+
+def completed_records(path, output_format):
+    """Registros ya escritos en una corrida anterior. Descarta una última línea
+    incompleta (corte a mitad de escritura) para poder continuar detrás de ella"""
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb+") as f:
+        # Buscar el último salto de línea desde el final, por bloques
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        while end > 0:
+            start = max(end - 65536, 0)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                end = start + newline + 1
+                break
+            end = start
+        if end < size:
+            f.truncate(end)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if output_format == 'jsonl':
+            return sum(1 for line in f if line.strip())
+        return max(sum(1 for _ in csv.reader(f)) - 1, 0)  # Sin el encabezado
+
+class ResultWriter:
+    def __init__(self, path, output_format, append):
+        self.output_format = output_format
+        self.file = open(path, "a" if append else "w", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.file)
+        self.has_header = append and os.path.getsize(path) > 0
+
+    def write(self, version, categories, results):
+        categories = sorted(categories)
+        if self.output_format == 'csv' and not self.has_header:
+            self.writer.writerow(["id", "category", "confidence"] + categories +
+                                 ["model_version", "error"])
+            self.has_header = True
+        for record_id, result in results:
+            if self.output_format == 'jsonl':
+                self.file.write(json.dumps(self.record(version, record_id, result)) + "\n")
+            else:
+                self.write_csv(version, categories, record_id, result)
+        # Cada lote queda en disco antes de seguir: es el punto de reanudación
+        self.file.flush()
+
+    @staticmethod
+    def record(version, record_id, result):
+        if isinstance(result, str):
+            return {"id": record_id, "error": result, "model_version": version}
+        return {"id": record_id, "category": result[0][0], "confidence": result[0][1],
+                "categories": [{"category": cat, "confidence": conf} for cat, conf in result],
+                "model_version": version}
+
+    def write_csv(self, version, categories, record_id, result):
+        if isinstance(result, str):
+            self.writer.writerow([record_id, "", ""] + [""] * len(categories) + [version, result])
+            return
+        confidences = dict(result)
+        self.writer.writerow([record_id, result[0][0], result[0][1]] +
+                             [confidences[cat] for cat in categories] + [version, ""])
+
+    def close(self):
+        self.file.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Clasificación masiva sin API: directorio de .txt, JSONL o CSV")
+    parser.add_argument("input", help="directorio (se recorre completo), .jsonl o .csv")
+    parser.add_argument("--output", required=True, help="archivo de resultados (.jsonl o .csv)")
+    parser.add_argument("--input-format", choices=["dir", "jsonl", "csv"])
+    parser.add_argument("--output-format", choices=["jsonl", "csv"])
+    parser.add_argument("--model", default=os.environ.get('MODEL_PATH', DEFAULT_MODEL),
+                        help="modelo .pkl o directorio mmap (por defecto MODEL_PATH o bbc_classifier.pkl)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--text-column", default="text", help="columna de texto del CSV")
+    parser.add_argument("--id-column", default="id", help="columna de id del CSV")
+    parser.add_argument("--resume", action="store_true",
+                        help="continúa una corrida interrumpida saltando los registros ya escritos")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    print("----------------CLASIFICACIÓN MASIVA----------------")
+
+    try:
+        input_format = args.input_format or detect_format(args.input)
+        output_format = args.output_format or ('csv' if args.output.lower().endswith('.csv')
+                                               else 'jsonl')
+        if os.path.exists(args.output) and not args.resume:
+            raise ValueError(f"{args.output} ya existe; usa --resume para continuar")
+
+        # La entrada se recorre siempre en el mismo orden: basta saltar los ya escritos
+        skip = completed_records(args.output, output_format) if args.resume else 0
+        records = islice(iter_input(args.input, input_format, args.text_column,
+                                    args.id_column), skip, None)
+        if skip:
+            print(f"Reanudando después de {skip} documentos ya clasificados")
+
+        writer = ResultWriter(args.output, output_format, append=skip > 0)
+        start = time.perf_counter()
+        done = 0
+        next_report = PROGRESS_EVERY
+        try:
+            for version, categories, results in classify_records(records, args.model,
+                                                                 args.workers, args.batch_size):
+                writer.write(version, categories, results)
+                done += len(results)
+                if done >= next_report:
+                    elapsed = time.perf_counter() - start
+                    print(f"{skip + done} documentos ({done / elapsed:.0f} docs/s)")
+                    next_report += PROGRESS_EVERY
+        finally:
+            writer.close()
+
+        elapsed = time.perf_counter() - start
+        print(f"\n{done} documentos clasificados en {elapsed:.1f} s "
+              f"({done / elapsed if elapsed else 0:.0f} docs/s)")
+        print(f"Resultados en: {args.output}")
+
+    except Exception as e:
+        print(f"\nERROR: {str(e)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import argparse
+import os
+import pickle
+import time
+import numpy as np
+
+from compiled_model import (HashedModel, CompactModel, COMPACT_DTYPES, load_model,
+                            model_from_dict, quantize_model)
+from evaluate_model import load_dataset, predict_indices, confusion_matrix, metrics_from_confusion
+from sparse_dataset import dataset_filename
+from train_model import write_model
+
+SCORE_METHODS = ('mi', 'chi2')
+TIMING_REPEATS = 5
+
+# ---------------- Poda ----------------
+
+def chi2_scores(word_counts, doc_counts):
+    """Chi² de cada palabra contra la clase (como sklearn.feature_selection.chi2):
+    observado = conteos clase×palabra; esperado = proporción de documentos de la clase
+    × total de la palabra"""
+    observed = word_counts.astype(np.float64)
+    class_prob = doc_counts / doc_counts.sum()
+    expected = class_prob[:, None] * observed.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(expected > 0, (observed - expected) ** 2 / expected, 0.0)
+    return terms.sum(axis=0)
+
+def mi_scores(word_counts):
+    """Aporte de cada palabra a la información mutua I(palabra; clase) entre
+    apariciones: Σ_c P(w,c) log(P(w,c) / (P(w) P(c)))"""
+    joint = word_counts / word_counts.sum()
+    word_prob = joint.sum(axis=0)
+    class_prob = joint.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(joint > 0, joint * np.log(joint / (class_prob[:, None] * word_prob)), 0.0)
+    return terms.sum(axis=0)
+
+def feature_scores(model, method='mi'):
+    if isinstance(model, HashedModel):
+        raise ValueError("La poda por palabra no aplica a modelos con hashing")
+    if not model.has_counts():
+        raise ValueError("El modelo no incluye conteos crudos; reentrena con train_model.py")
+    if method == 'chi2':
+        return chi2_scores(model.word_counts, model.doc_counts)
+    if method == 'mi':
+        return mi_scores(model.word_counts)
+    raise ValueError(f"Método de poda desconocido: {method}")
+
+def compact_model(model, keep=None, dtype='float32', method='mi', scores=None):
+    """Modelo compacto con las keep palabras más discriminativas (todas si keep es None)"""
+    if scores is None:
+        scores = feature_scores(model, method)
+    columns = None
+    if keep and keep < len(model.vocabulary):
+        columns = np.argsort(-scores, kind='stable')[:keep]
+    return quantize_model(model, dtype, columns)
+
+# ---------------- Reporte ----------------
+
+def _best_time(function):
+    best = float('inf')
+    for _ in range(TIMING_REPEATS):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def measure(model, features, vocabulary, true_labels):
+    """Tamaño, tiempo de carga, velocidad de puntuación y métricas de un modelo"""
+    data = pickle.dumps(model.to_dict())
+    load_seconds = _best_time(lambda: model_from_dict(pickle.loads(data)))
+
+    columns = model.columns_for(vocabulary)
+    batch_seconds = _best_time(lambda: predict_indices(features, vocabulary, model))
+
+    # Documentos como llegan a /classify: ids únicos del vocabulario del modelo
+    documents = []
+    for row in range(len(features)):
+        ids = columns[features.indices[features.indptr[row]:features.indptr[row + 1]]]
+        documents.append(ids[ids >= 0])
+    single_seconds = _best_time(lambda: [model.score_ids(ids) for ids in documents])
+
+    predicted = np.asarray(model.categories)[predict_indices(features, vocabulary, model)]
+    categories = sorted(set(true_labels) | set(model.categories))
+    metrics = metrics_from_confusion(confusion_matrix(true_labels, predicted, categories))
+
+    return {
+        'words': len(model.vocabulary),
+        'dtype': model.log_probs.dtype.name,
+        'pickle_bytes': len(data),
+        'matrix_bytes': model.log_probs.nbytes,
+        'load_ms': load_seconds * 1000,
+        'batch_docs_per_s': len(features) / batch_seconds if batch_seconds else 0.0,
+        'single_us_per_doc': single_seconds / max(len(documents), 1) * 1e6,
+        'accuracy': metrics['accuracy'],
+        'f1': metrics['f1'],
+        'predicted': predicted,
+    }
+
+def print_report(rows, reference):
+    print(f"\n{'Configuración':<22} {'Palabras':>8} {'Pickle':>10} {'Matriz':>10} "
+          f"{'Carga':>9} {'Lote':>11} {'Individual':>11} {'Exactitud':>10} {'ΔF1':>8} "
+          f"{'Coinciden':>10}")
+    for name, row in rows:
+        # Fracción de documentos con la misma predicción que el modelo completo
+        agreement = np.mean(row['predicted'] == reference['predicted'])
+        print(f"{name:<22} {row['words']:>8} {row['pickle_bytes'] / 1024:>8.0f}KB "
+              f"{row['matrix_bytes'] / 1024:>8.0f}KB {row['load_ms']:>7.1f}ms "
+              f"{row['batch_docs_per_s']:>7.0f}d/s {row['single_us_per_doc']:>8.1f}µs "
+              f"{row['accuracy']:>10.2%} {(row['f1'] - reference['f1']) * 100:>+7.2f}% "
+              f"{agreement:>10.2%}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compacta el modelo: poda de palabras poco discriminativas + cuantización")
+    parser.add_argument("--model", default=os.path.join("Analizador", "bbc_classifier.pkl"),
+                        help="modelo completo (con conteos crudos)")
+    parser.add_argument("--data", default="test_dataset",
+                        help="dataset de prueba en Analizador/preprocessed (sin extensión)")
+    parser.add_argument("--method", choices=SCORE_METHODS, default="mi",
+                        help="criterio de poda: información mutua o chi²")
+    parser.add_argument("--keep", type=int, nargs="+", default=[0],
+                        help="palabras a conservar (0 = todas); acepta varios valores")
+    parser.add_argument("--dtype", choices=COMPACT_DTYPES, nargs="+", default=["float32"],
+                        help="tipo de las log-probabilidades; acepta varios valores")
+    parser.add_argument("--output",
+                        help="guarda el modelo compacto (solo con una configuración)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    print("----------------COMPACTACIÓN DEL MODELO----------------")
+
+    try:
+        configs = [(keep, dtype) for keep in args.keep for dtype in args.dtype]
+        if args.output and len(configs) != 1:
+            raise ValueError("--output requiere exactamente un valor de --keep y de --dtype")
+
+        model = load_model(args.model)
+        if isinstance(model, CompactModel):
+            raise ValueError("El modelo ya es compacto; usa el modelo completo")
+        scores = feature_scores(model, args.method)
+        features, true_labels, vocabulary = load_dataset(dataset_filename(args.data))
+
+        reference = measure(model, features, vocabulary, true_labels)
+        rows = [("completo (float64)", reference)]
+        for keep, dtype in configs:
+            compact = compact_model(model, keep, dtype, args.method, scores)
+            name = f"{args.method} {keep or 'todas'} ({dtype})"
+            rows.append((name, measure(compact, features, vocabulary, true_labels)))
+        print_report(rows, reference)
+
+        if args.output:
+            write_model(compact, args.output)
+            print(f"\nModelo compacto guardado en: {args.output}")
+
+    except Exception as e:
+        print(f"\nERROR: {str(e)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,467 @@
+import glob
+import hashlib
+import json
+import math
+import os
+import pickle
+import shutil
+import sys
+import numpy as np
+import tokenizer
+from hashing import HashingVectorizer
+
+MODEL_FORMAT = 'compiled-v1'
+MMAP_FORMAT = 'mmap-v1'
+HASHED_FORMAT = 'hashed-v1'
+HASHED_MMAP_FORMAT = 'hashed-mmap-v1'
+COMPACT_FORMAT = 'compact-v1'
+COMPACT_DTYPES = ('float64', 'float32', 'float16', 'int8')
+
+class CompiledModel:
+    """Modelo Naïve Bayes precompilado: índice palabra→columna, vector de
+    log-priors y matriz densa (n_clases × vocabulario) de log-probabilidades"""
+
+    def __init__(self, categories, vocabulary, log_priors, log_probs,
+                 word_counts=None, doc_counts=None):
+        self.categories = list(categories)
+        self.vocabulary = list(vocabulary)
+        self.word_index = {word: idx for idx, word in enumerate(self.vocabulary)}
+        self.log_priors = np.asarray(log_priors, dtype=np.float64)
+        self.log_probs = np.asarray(log_probs, dtype=np.float64)
+        self.version = None
+        # Conteos crudos (opcionales) para poder continuar el entrenamiento
+        self.word_counts = None if word_counts is None else np.asarray(word_counts, dtype=np.int64)
+        self.doc_counts = None if doc_counts is None else np.asarray(doc_counts, dtype=np.int64)
+
+        if self.log_probs.shape != (len(self.categories), len(self.vocabulary)):
+            raise ValueError("Modelo corrupto: dimensiones de log_probs inconsistentes")
+        if self.log_priors.shape != (len(self.categories),):
+            raise ValueError("Modelo corrupto: dimensiones de log_priors inconsistentes")
+
+    def token_ids(self, tokens):
+        """Convierte tokens en índices del vocabulario, descartando los desconocidos"""
+        index = self.word_index
+        return [index[word] for word in tokens if word in index]
+
+    def text_ids(self, text):
+        """Índices del vocabulario de un texto crudo (tokenizador compartido)"""
+        return tokenizer.token_ids(text, self.word_index)
+
+    def text_ids_and_count(self, text):
+        """Índices del vocabulario y número de palabras del texto limpio"""
+        return tokenizer.token_ids_and_count(text, self.word_index)
+
+    def columns_for(self, words):
+        """Columna del modelo para cada palabra (-1 si no está en el vocabulario)"""
+        index = self.word_index
+        return np.array([index.get(word, -1) for word in words], dtype=np.intp)
+
+    def sum_log_probs(self, ids):
+        """Suma por clase de las log-probabilidades de las columnas ids"""
+        return self.log_probs[:, ids].sum(axis=1)
+
+    def score_ids(self, ids, counts=None):
+        """Log-verosimilitud por clase: gather de columnas + suma"""
+        ids = np.asarray(ids, dtype=np.intp)
+        if counts is None:
+            return self.log_priors + self.sum_log_probs(ids)
+        return self.log_priors + self.log_probs[:, ids] @ np.asarray(counts, dtype=np.float64)
+
+    def score_csr(self, indptr, indices, data):
+        """Log-verosimilitudes (n_docs × n_clases) de una matriz documento-término dispersa (CSR)"""
+        indptr = np.asarray(indptr, dtype=np.intp)
+        indices = np.asarray(indices, dtype=np.intp)
+        data = np.asarray(data, dtype=np.float64)
+        n_docs = len(indptr) - 1
+
+        # Fila de documento para cada entrada no nula
+        rows = np.repeat(np.arange(n_docs), np.diff(indptr))
+        scores = np.empty((n_docs, len(self.categories)), dtype=np.float64)
+        for col, class_log_probs in enumerate(self.log_probs):
+            weights = class_log_probs[indices] * data
+            scores[:, col] = np.bincount(rows, weights=weights, minlength=n_docs)
+        return scores + self.log_priors
+
+    def rank(self, scores):
+        """Convierte log-puntajes en confianzas (%) ordenadas de mayor a menor"""
+        max_score = max(scores)
+        exp_scores = [math.exp(score - max_score) for score in scores]
+        total = sum(exp_scores)
+        probs = [(cat, round((score / total) * 100, 2))
+                 for cat, score in zip(self.categories, exp_scores)]
+        return sorted(probs, key=lambda x: x[1], reverse=True)
+
+    def has_counts(self):
+        return self.word_counts is not None and self.doc_counts is not None
+
+    def to_dict(self):
+        model_data = {
+            'format': MODEL_FORMAT,
+            'categories': self.categories,
+            'vocabulary': self.vocabulary,
+            'log_priors': self.log_priors,
+            'log_probs': self.log_probs,
+        }
+        if self.has_counts():
+            model_data['word_counts'] = self.word_counts
+            model_data['doc_counts'] = self.doc_counts
+        return model_data
+
+def compile_model(class_probs, word_probs, vocabulary, word_counts=None, doc_counts=None):
+    """Compila las probabilidades {categoría: {palabra: prob}} a la matriz de log-probabilidades"""
+    categories = list(class_probs)
+    vocabulary = list(vocabulary)
+
+    log_priors = np.log([class_probs[cat] for cat in categories])
+    log_probs = np.empty((len(categories), len(vocabulary)), dtype=np.float64)
+    for row, category in enumerate(categories):
+        probs = word_probs[category]
+        log_probs[row] = np.log([probs[word] for word in vocabulary])
+
+    return CompiledModel(categories, vocabulary, log_priors, log_probs,
+                         word_counts, doc_counts)
+
+def model_from_counts(categories, vocabulary, word_counts, doc_counts, alpha=1.0):
+    """Compila directamente desde la matriz de conteos (n_clases × vocabulario),
+    con el mismo suavizado que NaiveBayesClassifier (solo palabras vistas)"""
+    word_counts = np.asarray(word_counts, dtype=np.int64)
+    doc_counts = np.asarray(doc_counts, dtype=np.int64)
+
+    # El vocabulario del clasificador son las palabras con algún conteo
+    seen = word_counts.sum(axis=0) > 0
+    vocabulary = [word for word, keep in zip(vocabulary, seen) if keep]
+    word_counts = word_counts[:, seen]
+
+    log_priors = np.log(doc_counts / doc_counts.sum())
+    # Mismo orden de operaciones que _update_probs: el resultado es idéntico bit a bit
+    totals = word_counts.sum(axis=1, keepdims=True)
+    log_probs = np.log((word_counts + alpha) / (totals + alpha * len(vocabulary)))
+    return CompiledModel(categories, vocabulary, log_priors, log_probs,
+                         word_counts, doc_counts)
+
+def hashed_model_from_counts(categories, vectorizer, word_counts, doc_counts, alpha=1.0):
+    """Compila la matriz de conteos por bucket (n_clases × n_buckets). Los buckets sin
+    conteos quedan en 0 para todas las clases: se ignoran igual que las palabras fuera
+    del vocabulario, y el suavizado usa solo los buckets vistos"""
+    word_counts = np.asarray(word_counts, dtype=np.int64)
+    doc_counts = np.asarray(doc_counts, dtype=np.int64)
+
+    seen = word_counts.sum(axis=0) > 0
+    log_priors = np.log(doc_counts / doc_counts.sum())
+    totals = word_counts.sum(axis=1, keepdims=True)
+    log_probs = np.where(seen, np.log((word_counts + alpha) / (totals + alpha * seen.sum())), 0.0)
+    return HashedModel(categories, vectorizer, log_priors, log_probs, word_counts, doc_counts)
+
+def model_from_dict(model_data):
+    """Construye el modelo compilado; los pickles antiguos (dict de dicts) se compilan al cargar"""
+    if model_data.get('format') == COMPACT_FORMAT:
+        return CompactModel(model_data['categories'], model_data['vocabulary'],
+                            model_data['log_priors'], model_data['log_probs'],
+                            model_data['scale'], model_data['offset'])
+    if model_data.get('format') == HASHED_FORMAT:
+        return HashedModel(model_data['categories'],
+                           HashingVectorizer.from_params(model_data['hashing']),
+                           model_data['log_priors'], model_data['log_probs'],
+                           model_data.get('word_counts'), model_data.get('doc_counts'))
+    if model_data.get('format') == MODEL_FORMAT:
+        return CompiledModel(model_data['categories'], model_data['vocabulary'],
+                             model_data['log_priors'], model_data['log_probs'],
+                             model_data.get('word_counts'), model_data.get('doc_counts'))
+
+    for key in ['class_probs', 'word_probs', 'vocabulary']:
+        if key not in model_data:
+            raise ValueError(f"Modelo corrupto: falta {key}")
+    return compile_model(model_data['class_probs'], model_data['word_probs'],
+                         model_data['vocabulary'])
+
+def load_model(path):
+    """Carga un modelo desde disco: directorio mmap, pickle compilado o pickle antiguo"""
+    if os.path.isdir(path):
+        # El enlace se resuelve una sola vez: todos los arreglos salen de la misma versión
+        path = os.path.realpath(path)
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format') == HASHED_MMAP_FORMAT:
+            return HashedModel(meta['categories'], HashingVectorizer.from_params(meta['hashing']),
+                               np.load(os.path.join(path, 'log_priors.npy')),
+                               np.load(os.path.join(path, 'log_probs.npy'), mmap_mode='r'))
+        return MmapModel(path)
+    with open(path, 'rb') as f:
+        return model_from_dict(pickle.load(f))
+
+class MmapModel(CompiledModel):
+    """Modelo compilado leído con mmap de solo lectura: los procesos de la API
+    comparten las páginas del archivo en lugar de tener copias privadas.
+    El vocabulario es un arreglo ordenado de ancho fijo que se consulta con
+    búsqueda binaria, así que no se construye el diccionario palabra→columna"""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format') != MMAP_FORMAT:
+            raise ValueError(f"Formato de modelo desconocido: {meta.get('format')}")
+
+        self.categories = meta['categories']
+        self.version = None
+        self.word_counts = None
+        self.doc_counts = None
+
+        self.vocab_array = np.load(os.path.join(directory, 'vocabulary.npy'), mmap_mode='r')
+        self.log_priors = np.load(os.path.join(directory, 'log_priors.npy'))
+        self.log_probs = np.load(os.path.join(directory, 'log_probs.npy'), mmap_mode='r')
+        self.max_word_len = self.vocab_array.dtype.itemsize
+
+        if self.log_probs.shape != (len(self.categories), len(self.vocab_array)):
+            raise ValueError("Modelo corrupto: dimensiones de log_probs inconsistentes")
+        if self.log_priors.shape != (len(self.categories),):
+            raise ValueError("Modelo corrupto: dimensiones de log_priors inconsistentes")
+
+    @property
+    def vocabulary(self):
+        return [word.decode('utf-8') for word in self.vocab_array]
+
+    def columns_for(self, words):
+        encoded = [word.encode('utf-8') for word in words]
+        # Las palabras más largas que el ancho fijo no pueden estar en el vocabulario
+        fits = np.array([len(word) <= self.max_word_len for word in encoded], dtype=bool)
+        keys = np.array([word if ok else b'' for word, ok in zip(encoded, fits)],
+                        dtype=self.vocab_array.dtype)
+
+        columns = np.searchsorted(self.vocab_array, keys)
+        columns = np.minimum(columns, len(self.vocab_array) - 1)
+        found = fits & (self.vocab_array[columns] == keys) if len(keys) else fits
+        return np.where(found, columns, -1).astype(np.intp)
+
+    def text_ids(self, text):
+        return self.token_ids(tokenizer.tokenize(text))
+
+    def text_ids_and_count(self, text):
+        tokens, n_words = tokenizer.tokenize_and_count(text)
+        return self.token_ids(tokens), n_words
+
+    def token_ids(self, tokens):
+        if not tokens or len(self.vocab_array) == 0:
+            return []
+        columns = self.columns_for(tokens)
+        return columns[columns >= 0].tolist()
+
+class HashedModel(CompiledModel):
+    """Modelo sobre un HashingVectorizer: la matriz de log-probabilidades tiene
+    n_buckets columnas fijas y no guarda ninguna palabra"""
+
+    def __init__(self, categories, vectorizer, log_priors, log_probs,
+                 word_counts=None, doc_counts=None):
+        self.categories = list(categories)
+        self.vectorizer = vectorizer
+        self.vocabulary = []
+        self.word_index = {}
+        self.log_priors = np.asarray(log_priors, dtype=np.float64)
+        self.log_probs = np.asarray(log_probs, dtype=np.float64)
+        self.version = None
+        self.word_counts = None if word_counts is None else np.asarray(word_counts, dtype=np.int64)
+        self.doc_counts = None if doc_counts is None else np.asarray(doc_counts, dtype=np.int64)
+
+        if self.log_probs.shape != (len(self.categories), vectorizer.n_buckets):
+            raise ValueError("Modelo corrupto: dimensiones de log_probs inconsistentes")
+        if self.log_priors.shape != (len(self.categories),):
+            raise ValueError("Modelo corrupto: dimensiones de log_priors inconsistentes")
+
+    def token_ids(self, tokens):
+        return self.vectorizer.bucket_ids(tokens).tolist()
+
+    def text_ids(self, text):
+        return self.vectorizer.text_ids(text)
+
+    def text_ids_and_count(self, text):
+        return self.vectorizer.text_ids_and_count(text)
+
+    def columns_for(self, words):
+        return self.vectorizer.bucket_ids(list(words))
+
+    def to_dict(self):
+        model_data = super().to_dict()
+        model_data['format'] = HASHED_FORMAT
+        model_data['hashing'] = self.vectorizer.params()
+        del model_data['vocabulary']
+        return model_data
+
+class CompactModel(CompiledModel):
+    """Modelo compacto para réplicas con poca memoria: vocabulario podado y
+    log-probabilidades cuantizadas (float32, float16 o int8). Cada clase guarda una
+    escala y un desplazamiento: log_prob ≈ valor * scale + offset (1 y 0 para floats).
+    Las sumas se hacen en float64 y no se guardan conteos crudos"""
+
+    def __init__(self, categories, vocabulary, log_priors, quantized, scale, offset):
+        self.categories = list(categories)
+        self.vocabulary = list(vocabulary)
+        self.word_index = {word: idx for idx, word in enumerate(self.vocabulary)}
+        self.log_priors = np.asarray(log_priors, dtype=np.float64)
+        self.log_probs = np.asarray(quantized)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.offset = np.asarray(offset, dtype=np.float64)
+        self.version = None
+        self.word_counts = None
+        self.doc_counts = None
+
+        if self.log_probs.dtype.name not in COMPACT_DTYPES:
+            raise ValueError(f"Tipo de cuantización no soportado: {self.log_probs.dtype}")
+        if self.log_probs.shape != (len(self.categories), len(self.vocabulary)):
+            raise ValueError("Modelo corrupto: dimensiones de log_probs inconsistentes")
+        if self.scale.shape != self.offset.shape or self.scale.shape != (len(self.categories),):
+            raise ValueError("Modelo corrupto: escala por clase inconsistente")
+
+    @property
+    def dtype(self):
+        return self.log_probs.dtype.name
+
+    def sum_log_probs(self, ids):
+        values = self.log_probs[:, ids].sum(axis=1, dtype=np.float64)
+        return values * self.scale + self.offset * len(ids)
+
+    def score_ids(self, ids, counts=None):
+        ids = np.asarray(ids, dtype=np.intp)
+        if counts is None:
+            return self.log_priors + self.sum_log_probs(ids)
+        counts = np.asarray(counts, dtype=np.float64)
+        values = self.log_probs[:, ids].astype(np.float64) @ counts
+        return self.log_priors + values * self.scale + self.offset * counts.sum()
+
+    def score_csr(self, indptr, indices, data):
+        indptr = np.asarray(indptr, dtype=np.intp)
+        indices = np.asarray(indices, dtype=np.intp)
+        data = np.asarray(data, dtype=np.float64)
+        n_docs = len(indptr) - 1
+
+        rows = np.repeat(np.arange(n_docs), np.diff(indptr))
+        words_per_doc = np.bincount(rows, weights=data, minlength=n_docs)
+        scores = np.empty((n_docs, len(self.categories)), dtype=np.float64)
+        for col, class_values in enumerate(self.log_probs):
+            weights = class_values[indices].astype(np.float64) * data
+            sums = np.bincount(rows, weights=weights, minlength=n_docs)
+            scores[:, col] = sums * self.scale[col] + self.offset[col] * words_per_doc
+        return scores + self.log_priors
+
+    def dequantized(self):
+        """Matriz float64 aproximada (para medir el error de cuantización)"""
+        return self.log_probs.astype(np.float64) * self.scale[:, None] + self.offset[:, None]
+
+    def to_dict(self):
+        return {
+            'format': COMPACT_FORMAT,
+            'categories': self.categories,
+            'vocabulary': self.vocabulary,
+            'log_priors': self.log_priors,
+            'log_probs': self.log_probs,
+            'scale': self.scale,
+            'offset': self.offset,
+        }
+
+def quantize_model(model, dtype='float32', columns=None):
+    """Modelo compacto con las columnas indicadas (todas por defecto) cuantizadas a dtype"""
+    if dtype not in COMPACT_DTYPES:
+        raise ValueError(f"Tipo de cuantización no soportado: {dtype}")
+    if columns is None:
+        columns = np.arange(len(model.vocabulary))
+    columns = np.sort(np.asarray(columns, dtype=np.intp))
+    vocabulary = [model.vocabulary[idx] for idx in columns]
+    log_probs = np.asarray(model.log_probs[:, columns], dtype=np.float64)
+    n_classes = len(model.categories)
+
+    if dtype != 'int8':
+        return CompactModel(model.categories, vocabulary, model.log_priors,
+                            log_probs.astype(dtype), np.ones(n_classes), np.zeros(n_classes))
+
+    # int8 afín por clase: el rango [mín, máx] de cada fila ocupa los 256 niveles
+    if log_probs.size:
+        low, high = log_probs.min(axis=1), log_probs.max(axis=1)
+    else:
+        low = high = np.zeros(n_classes)
+    scale = np.where(high > low, (high - low) / 255, 1.0)
+    offset = low + 128 * scale
+    quantized = np.clip(np.rint((log_probs - offset[:, None]) / scale[:, None]), -128, 127)
+    return CompactModel(model.categories, vocabulary, model.log_priors,
+                        quantized.astype(np.int8), scale, offset)
+
+def export_mmap(model, directory):
+    """Escribe el modelo en el formato de arreglos de ancho fijo para mmap. Cada versión
+    va a su propio directorio (directory.v<huella>) y directory es un enlace simbólico que
+    se cambia atómicamente al final: quien carga el modelo durante una exportación ve
+    siempre los arreglos y el meta.json de una sola versión"""
+    if isinstance(model, CompactModel):
+        raise ValueError("Los modelos compactos se sirven desde el pickle; exporta el modelo completo")
+    if isinstance(model, HashedModel):
+        # Sin vocabulario: las columnas ya son los buckets
+        arrays = {
+            'log_priors.npy': np.asarray(model.log_priors, dtype=np.float64),
+            'log_probs.npy': np.ascontiguousarray(model.log_probs, dtype=np.float64),
+        }
+    else:
+        # Columnas ordenadas por palabra para permitir la búsqueda binaria
+        vocabulary = list(model.vocabulary)
+        order = sorted(range(len(vocabulary)), key=lambda idx: vocabulary[idx].encode('utf-8'))
+        vocab_array = np.array([vocabulary[idx].encode('utf-8') for idx in order], dtype=bytes)
+        log_probs = np.ascontiguousarray(np.asarray(model.log_probs)[:, order], dtype=np.float64)
+
+        arrays = {
+            'vocabulary.npy': vocab_array,
+            'log_priors.npy': np.asarray(model.log_priors, dtype=np.float64),
+            'log_probs.npy': log_probs,
+        }
+    # La huella de los arreglos nombra la versión y evita tener que leerlos
+    # completos para versionarlos
+    fingerprint = hashlib.sha256()
+    for name, array in arrays.items():
+        fingerprint.update(name.encode('utf-8'))
+        fingerprint.update(array.tobytes())
+    meta = {
+        'format': MMAP_FORMAT,
+        'categories': list(model.categories),
+        'fingerprint': fingerprint.hexdigest(),
+    }
+    if isinstance(model, HashedModel):
+        meta['format'] = HASHED_MMAP_FORMAT
+        meta['hashing'] = model.vectorizer.params()
+
+    directory = directory.rstrip(os.sep)
+    version_dir = f"{directory}.v{meta['fingerprint'][:12]}"
+    if not os.path.exists(os.path.join(version_dir, 'meta.json')):
+        # Se escribe completo en un directorio temporal y se renombra de una vez
+        tmp_dir = f"{version_dir}.tmp{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name, array in arrays.items():
+            with open(os.path.join(tmp_dir, name), 'wb') as f:
+                np.save(f, array)
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        shutil.rmtree(version_dir, ignore_errors=True)
+        os.replace(tmp_dir, version_dir)
+    publish_version(directory, version_dir)
+
+def publish_version(directory, version_dir):
+    """Apunta el enlace directory a version_dir (os.replace de un enlace es atómico) y
+    borra las versiones anteriores salvo la recién reemplazada, que algún proceso puede
+    estar terminando de abrir. Los procesos que ya la mapearon conservan sus páginas"""
+    previous = os.path.realpath(directory) if os.path.islink(directory) else None
+    if os.path.isdir(directory) and not os.path.islink(directory):
+        # Exportación anterior como directorio real: se reemplaza una sola vez
+        shutil.rmtree(directory)
+    link_tmp = f"{directory}.link{os.getpid()}"
+    if os.path.lexists(link_tmp):
+        os.remove(link_tmp)
+    os.symlink(os.path.basename(version_dir), link_tmp)
+    os.replace(link_tmp, directory)
+
+    keep = {os.path.realpath(version_dir), previous}
+    for old_dir in glob.glob(glob.escape(directory) + '.v*'):
+        if os.path.isdir(old_dir) and not os.path.islink(old_dir) and \
+                os.path.realpath(old_dir) not in keep and '.tmp' not in os.path.basename(old_dir):
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    # Uso: python Analizador/compiled_model.py <modelo.pkl> <directorio_mmap>
+    if len(sys.argv) != 3:
+        print("Uso: python compiled_model.py <modelo.pkl> <directorio_mmap>")
+        sys.exit(1)
+    export_mmap(load_model(sys.argv[1]), sys.argv[2])
+    print(f"Modelo exportado para mmap en: {sys.argv[2]}")
@@ -1,78 +1,102 @@
-from collections import defaultdict
-import pickle
+import argparse
 import os
 import csv
-from sklearn.metrics import precision_score, recall_score, f1_score, confusion_matrix
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-def load_dataset(filename):
-    """Carga el dataset de prueba"""
-    filepath = os.path.join("Analizador", "preprocessed", filename)
-    
-    features = []
-    true_labels = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        vocabulary = next(reader)[:-1]  # Excluye la columna de categoría
-        
-        for row in reader:
-            features.append([int(count) for count in row[:-1]])
-            true_labels.append(row[-1])
-    
-    return features, true_labels, vocabulary
+from multiprocessing import Pool
+import numpy as np
+from compiled_model import load_model, model_from_counts, hashed_model_from_counts
+from fingerprints import file_digest, fingerprint, fresh_stamp, write_stamp
+from sparse_dataset import (load_sparse_dataset, from_dense_rows, dataset_filename,
+                            take_rows, concat_datasets, class_counts, PREPROCESSED_DIR)
 
-def predict_with_model(features, vocabulary, model_data):
-    """Realiza predicciones usando el modelo cargado"""
-    pred_labels = []
-    class_probs = model_data['class_probs']
-    word_probs = model_data['word_probs']
+def load_dataset(filename, directory=PREPROCESSED_DIR):
+    """Carga el dataset de prueba como matriz dispersa (CSR)"""
+    filepath = os.path.join(directory, filename)
     
-    for feature_row in features:
-        features_dict = {word: count for word, count in zip(vocabulary, feature_row)}  
-        
-        best_class = None
-        max_log_prob = -float('inf')
-        
-        for category in class_probs:
-            log_prob = math.log(class_probs[category])
-            
-            for word, count in features_dict.items():
-                if count > 0 and word in word_probs.get(category, {}):
-                    log_prob += math.log(word_probs[category][word]) * count
+    if filepath.endswith('.npz'):
+        sparse = load_sparse_dataset(filepath)
+    else:
+        rows = []
+        true_labels = []
+        with open(filepath, 'r', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            vocabulary = next(reader)[:-1]  # Excluye la columna de categoría
             
-            if log_prob > max_log_prob:
-                max_log_prob = log_prob
-                best_class = category
-        
-        pred_labels.append(best_class)
+            for row in reader:
+                rows.append([int(count) for count in row[:-1]])
+                true_labels.append(row[-1])
+        sparse = from_dense_rows(vocabulary, rows, true_labels)
     
-    return pred_labels
+    return sparse, sparse.labels, sparse.vocabulary
 
+CV_SEED = 42
+EVALUATION_STAMP = os.path.join(PREPROCESSED_DIR, "evaluation.stamp.json")
 
-def print_metrics(true_labels, pred_labels, categories):
-    """Calcula e imprime métricas de evaluación"""
-    # Métricas generales
-    precision = precision_score(true_labels, pred_labels, average='weighted')
-    recall = recall_score(true_labels, pred_labels, average='weighted')
-    f1 = f1_score(true_labels, pred_labels, average='weighted')
+def predict_indices(features, vocabulary, model):
+    """Índice (en model.categories) de la clase predicha para cada fila de la matriz CSR"""
+    if features.hashing:
+        # Las columnas son buckets: coinciden si modelo y dataset usan el mismo hashing
+        if getattr(model, 'vectorizer', None) != features.hashing:
+            raise ValueError("El modelo y el dataset no usan los mismos parámetros de hashing")
+        return predict_mapped(features, np.arange(features.n_features), model)
+    # Columnas del modelo para cada columna del dataset (-1 si no existe)
+    return predict_mapped(features, model.columns_for(vocabulary), model)
+
+def predict_mapped(features, columns, model):
+    """Como predict_indices, con la columna del modelo de cada columna del dataset ya calculada"""
+    mapped = columns[features.indices]
+    known = mapped >= 0
+    # Recalcular indptr descartando las palabras que el modelo no conoce
+    rows = np.repeat(np.arange(len(features)), np.diff(features.indptr))
+    kept_per_row = np.bincount(rows[known], minlength=len(features))
+    indptr = np.concatenate(([0], np.cumsum(kept_per_row)))
     
-    print("\n----------------MÉTRICAS GENERALES----------------")
-    print(f"Precisión: {precision:.2%}")
-    print(f"Recall: {recall:.2%}")
-    print(f"F1-Score: {f1:.2%}")
+    scores = model.score_csr(indptr, mapped[known], features.data[known])
+    return np.argmax(scores, axis=1)
+
+def predict_with_model(features, vocabulary, model):
+    """Realiza predicciones usando el modelo compilado sobre la matriz CSR"""
+    return [model.categories[idx] for idx in predict_indices(features, vocabulary, model)]
+
+def confusion_matrix(true_labels, pred_labels, categories):
+    """Matriz de confusión (filas: real, columnas: predicción) en un solo bincount"""
+    index = {category: idx for idx, category in enumerate(categories)}
+    n = len(categories)
+    true_ids = np.fromiter((index[label] for label in true_labels), dtype=np.int64)
+    pred_ids = np.fromiter((index[label] for label in pred_labels), dtype=np.int64)
+    return np.bincount(true_ids * n + pred_ids, minlength=n * n).reshape(n, n)
+
+def _safe_divide(numerator, denominator):
+    return np.divide(numerator, denominator, out=np.zeros(len(numerator)),
+                     where=denominator > 0)
+
+def metrics_from_confusion(conf_matrix):
+    """Precisión, recall y F1 por clase y promedios ponderados por soporte (0 si no hay casos)"""
+    tp = np.diag(conf_matrix).astype(np.float64)
+    support = conf_matrix.sum(axis=1)
+    precision = _safe_divide(tp, conf_matrix.sum(axis=0))
+    recall = _safe_divide(tp, support)
+    f1 = _safe_divide(2 * precision * recall, precision + recall)
+
+    weights = support / support.sum()
+    return {
+        'accuracy': tp.sum() / conf_matrix.sum(),
+        'precision': float(weights @ precision),
+        'recall': float(weights @ recall),
+        'f1': float(weights @ f1),
+        'per_class': {'precision': precision, 'recall': recall, 'f1': f1, 'support': support},
+    }
+
+
+def print_metrics(true_labels, pred_labels, categories):
+    """Calcula e imprime métricas de evaluación y guarda la matriz de confusión"""
+    # Importación diferida: solo el gráfico necesita matplotlib/seaborn, y otros módulos
+    # (sweep, compact_model) importan este archivo solo para predecir y medir
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     
-    # Métricas por categoría
-    print("\n----------------MÉTRICAS POR CATEGORÍA----------------")
-    print(f"{'Categoría':<15} {'Precisión':<10} {'Recall':<10} {'F1-Score':<10}")
-    for category in categories:
-        precision = precision_score(true_labels, pred_labels, labels=[category], average='micro')
-        recall = recall_score(true_labels, pred_labels, labels=[category], average='micro')
-        f1 = f1_score(true_labels, pred_labels, labels=[category], average='micro')
-        print(f"{category:<15} {precision:<10.2%} {recall:<10.2%} {f1:<10.2%}")
+    conf_matrix = evaluate_model(true_labels, pred_labels, categories)
     
     # Matriz de confusión
-    conf_matrix = confusion_matrix(true_labels, pred_labels, labels=categories)
     plt.figure(figsize=(10, 8))
     sns.heatmap(conf_matrix, annot=True, fmt='d', cmap='Blues',
                 xticklabels=categories, yticklabels=categories)
@@ -83,63 +107,141 @@ def print_metrics(true_labels, pred_labels, categories):
     print("\nMatriz de confusión guardada en 'Analizador/preprocessed/confusion_matrix.png'")
     
 def evaluate_model(true_labels, pred_labels, categories):
-    """Evaluación mejorada con manejo de casos extremos"""
-    # Configurar zero_division para evitar warnings
-    precision = precision_score(true_labels, pred_labels, average='weighted', zero_division=0)
-    recall = recall_score(true_labels, pred_labels, average='weighted', zero_division=0)
-    f1 = f1_score(true_labels, pred_labels, average='weighted', zero_division=0)
+    """Imprime las métricas derivadas de una sola matriz de confusión y la devuelve"""
+    conf_matrix = confusion_matrix(true_labels, pred_labels, categories)
+    print_confusion_metrics(conf_matrix, categories)
+    return conf_matrix
+
+def print_confusion_metrics(conf_matrix, categories):
+    metrics = metrics_from_confusion(conf_matrix)
     
     print("\n----------------MÉTRICAS GENERALES----------------")
-    print(f"Precisión: {precision:.2%}")
-    print(f"Recall: {recall:.2%}")
-    print(f"F1-Score: {f1:.2%}")
+    print(f"Precisión: {metrics['precision']:.2%}")
+    print(f"Recall: {metrics['recall']:.2%}")
+    print(f"F1-Score: {metrics['f1']:.2%}")
     
     print("\n----------------MÉTRICAS POR CATEGORÍA----------------")
     print(f"{'Categoría':<15} {'Precisión':<10} {'Recall':<10} {'F1-Score':<10} {'Ejemplos':<10}")
     
-    for category in categories:
-        # Filtramos solo las predicciones para esta categoría
-        y_true_cat = [1 if y == category else 0 for y in true_labels]
-        y_pred_cat = [1 if y == category else 0 for y in pred_labels]
-        
-        tp = sum(1 for t, p in zip(y_true_cat, y_pred_cat) if t == 1 and p == 1)
-        fp = sum(1 for t, p in zip(y_true_cat, y_pred_cat) if t == 0 and p == 1)
-        fn = sum(1 for t, p in zip(y_true_cat, y_pred_cat) if t == 1 and p == 0)
-        
-        precision_cat = tp / (tp + fp) if (tp + fp) > 0 else 0
-        recall_cat = tp / (tp + fn) if (tp + fn) > 0 else 0
-        f1_cat = 2 * (precision_cat * recall_cat) / (precision_cat + recall_cat) if (precision_cat + recall_cat) > 0 else 0
-        count = sum(1 for y in true_labels if y == category)
-        
-        print(f"{category:<15} {precision_cat:<10.2%} {recall_cat:<10.2%} {f1_cat:<10.2%} {count:<10}")
+    per_class = metrics['per_class']
+    for idx, category in enumerate(categories):
+        print(f"{category:<15} {per_class['precision'][idx]:<10.2%} {per_class['recall'][idx]:<10.2%} "
+              f"{per_class['f1'][idx]:<10.2%} {per_class['support'][idx]:<10}")
+
+# Dataset y particiones compartidos con los procesos de la validación cruzada
+_cv_state = {}
+
+def _init_cv(sparse, folds, categories):
+    _cv_state['sparse'] = sparse
+    _cv_state['folds'] = folds
+    _cv_state['categories'] = categories
+
+def _run_fold(fold):
+    """Entrena con todas las particiones menos una y devuelve la matriz de confusión de esa"""
+    sparse, folds, categories = _cv_state['sparse'], _cv_state['folds'], _cv_state['categories']
+    train_rows = np.concatenate([rows for idx, rows in enumerate(folds) if idx != fold])
+    test = take_rows(sparse, folds[fold])
+    
+    word_counts, doc_counts = class_counts(take_rows(sparse, train_rows), categories)
+    if sparse.hashing:
+        model = hashed_model_from_counts(categories, sparse.hashing, word_counts, doc_counts)
+    else:
+        model = model_from_counts(categories, sparse.vocabulary, word_counts, doc_counts)
+    pred_ids = predict_indices(test, test.vocabulary, model)
+    
+    pred_labels = [categories[idx] for idx in pred_ids]
+    return confusion_matrix(test.labels, pred_labels, categories)
+
+def cross_validate(sparse, k=5, workers=None, seed=CV_SEED):
+    """Validación cruzada de k particiones; cada partición se evalúa en su propio proceso"""
+    if not 2 <= k <= len(sparse):
+        raise ValueError(f"k debe estar entre 2 y el número de documentos ({len(sparse)})")
+    
+    categories = sorted(set(sparse.labels))
+    order = np.random.RandomState(seed).permutation(len(sparse))
+    folds = np.array_split(order, k)
+    
+    workers = min(workers or os.cpu_count() or 1, k)
+    if workers > 1:
+        with Pool(workers, initializer=_init_cv, initargs=(sparse, folds, categories)) as pool:
+            matrices = pool.map(_run_fold, range(k))
+    else:
+        _init_cv(sparse, folds, categories)
+        matrices = [_run_fold(fold) for fold in range(k)]
+    
+    return categories, [metrics_from_confusion(matrix) for matrix in matrices]
+
+def print_cv_results(categories, fold_metrics):
+    """Media y desviación estándar de las métricas entre particiones"""
+    def summary(values):
+        values = np.asarray(values, dtype=np.float64)
+        std = values.std(ddof=1) if len(values) > 1 else 0.0
+        return f"{values.mean():.2%} ± {std:.2%}"
+    
+    print(f"\n----------------VALIDACIÓN CRUZADA ({len(fold_metrics)} particiones)----------------")
+    for name, label in [('accuracy', 'Exactitud'), ('precision', 'Precisión'),
+                        ('recall', 'Recall'), ('f1', 'F1-Score')]:
+        print(f"{label}: {summary([m[name] for m in fold_metrics])}")
+    
+    print("\n----------------MÉTRICAS POR CATEGORÍA (media ± desv.)----------------")
+    print(f"{'Categoría':<15} {'Precisión':<18} {'Recall':<18} {'F1-Score':<18}")
+    for idx, category in enumerate(categories):
+        cells = [summary([m['per_class'][name][idx] for m in fold_metrics])
+                 for name in ('precision', 'recall', 'f1')]
+        print(f"{category:<15} {cells[0]:<18} {cells[1]:<18} {cells[2]:<18}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Evalúa el clasificador Naïve Bayes")
+    parser.add_argument("--data", default="test_dataset",
+                        help="dataset de prueba en Analizador/preprocessed (sin extensión)")
+    parser.add_argument("--cv", type=int, metavar="K",
+                        help="validación cruzada de K particiones en lugar de evaluar el modelo guardado")
+    parser.add_argument("--cv-data", nargs="+", default=["train_dataset", "test_dataset"],
+                        help="datasets que se unen para la validación cruzada")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="procesos para evaluar las particiones en paralelo")
+    parser.add_argument("--seed", type=int, default=CV_SEED)
+    parser.add_argument("--force", action="store_true",
+                        help="reevalúa aunque el modelo y el dataset no hayan cambiado")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
     print("----------------EVALUACIÓN DEL MODELO----------------")
     
     try:
+        if args.cv:
+            datasets = [load_dataset(dataset_filename(name))[0] for name in args.cv_data]
+            categories, fold_metrics = cross_validate(concat_datasets(datasets), args.cv,
+                                                      args.workers, args.seed)
+            print_cv_results(categories, fold_metrics)
+            return
+        
         # 1. Cargar modelo con verificación
         model_path = os.path.join("Analizador", "bbc_classifier.pkl")
-        with open(model_path, 'rb') as f:
-            model_data = pickle.load(f)
-            
-            # Verificar estructura del modelo
-            required_keys = ['class_probs', 'word_probs', 'vocabulary']
-            for key in required_keys:
-                if key not in model_data:
-                    raise ValueError(f"Modelo corrupto: falta {key}")
+        data_name = dataset_filename(args.data)
+        inputs = fingerprint('evaluate', file_digest(model_path),
+                             file_digest(os.path.join(PREPROCESSED_DIR, data_name)))
+        stamp = None if args.force else fresh_stamp(EVALUATION_STAMP, inputs)
+        if stamp:
+            print("\nModelo y dataset sin cambios: métricas de la evaluación anterior")
+            print_confusion_metrics(np.array(stamp['confusion_matrix']), stamp['categories'])
+            return
+        model = load_model(model_path)
         
         # 2. Cargar datos de prueba
-        test_features, true_labels, vocabulary = load_dataset('test_dataset.csv')
+        test_features, true_labels, vocabulary = load_dataset(data_name)
         
         # 3. Predecir y evaluar
-        pred_labels = predict_with_model(test_features, vocabulary, model_data)
-        categories = sorted(list(set(true_labels)))
+        pred_labels = predict_with_model(test_features, vocabulary, model)
+        categories = sorted(set(true_labels) | set(model.categories))
         
-        evaluate_model(true_labels, pred_labels, categories)
+        conf_matrix = evaluate_model(true_labels, pred_labels, categories)
+        write_stamp(EVALUATION_STAMP, inputs, categories=categories,
+                    confusion_matrix=conf_matrix.tolist())
         
     except Exception as e:
         print(f"\nERROR: {str(e)}")
 
 if __name__ == '__main__':
-    import math
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+
+def file_digest(path):
+    """SHA-256 del contenido del archivo, leído por bloques"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def path_digest(path):
+    """Huella de un archivo o de un directorio (nombres y contenido de sus archivos)"""
+    if not os.path.isdir(path):
+        return file_digest(path)
+    digest = hashlib.sha256()
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        for name in sorted(filenames):
+            file_path = os.path.join(dirpath, name)
+            digest.update(os.path.relpath(file_path, path).encode('utf-8'))
+            digest.update(file_digest(file_path).encode('ascii'))
+    return digest.hexdigest()
+
+def files_fingerprint(paths, digest=file_digest):
+    """Huella de una lista de archivos (ruta y contenido), calculada en streaming sin
+    guardar la huella de cada uno. Un archivo ilegible cuenta como faltante"""
+    combined = hashlib.sha256()
+    for path in paths:
+        try:
+            file_hash = digest(path)
+        except OSError:
+            file_hash = None
+        combined.update(json.dumps([path, file_hash]).encode('utf-8'))
+    return combined.hexdigest()
+
+def fingerprint(*parts):
+    """Huella de las entradas de una etapa: huellas de archivos y parámetros serializables"""
+    data = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+def stamp_path(artifact):
+    return artifact.rstrip(os.sep) + '.stamp.json'
+
+def read_stamp(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def fresh_stamp(path, inputs):
+    """Devuelve el sello si las entradas no cambiaron y los artefactos que registra
+    siguen en disco con el mismo contenido; None si hay que rehacer la etapa"""
+    stamp = read_stamp(path)
+    if not stamp or stamp.get('inputs') != inputs:
+        return None
+    for output, digest in stamp.get('outputs', {}).items():
+        if not os.path.exists(output) or path_digest(output) != digest:
+            return None
+    return stamp
+
+def write_stamp(path, inputs, outputs=(), **extra):
+    """Registra la huella de las entradas y la de cada artefacto generado (escritura atómica)"""
+    stamp = {'inputs': inputs, 'outputs': {output: path_digest(output) for output in outputs}}
+    stamp.update(extra)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(stamp, f, indent=2)
+    os.replace(tmp_path, path)
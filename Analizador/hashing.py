@@ -0,0 +1,59 @@
+import zlib
+import numpy as np
+from tokenizer import tokenize, tokenize_and_count
+
+DEFAULT_BUCKETS = 2 ** 18
+_SIGN_BIT = 0x80000000
+
+class HashingVectorizer:
+    """Vectorizador sin vocabulario: cada palabra va al bucket crc32(palabra) % n_buckets.
+    Con signed=True un bit del hash da el signo (+1/-1) de cada aparición, así las
+    colisiones dentro de un documento tienden a cancelarse; como Naïve Bayes necesita
+    conteos no negativos, se guarda el valor absoluto de la suma de cada bucket"""
+
+    def __init__(self, n_buckets=DEFAULT_BUCKETS, signed=False):
+        if n_buckets <= 0:
+            raise ValueError("El número de buckets debe ser positivo")
+        self.n_buckets = int(n_buckets)
+        self.signed = bool(signed)
+
+    def __eq__(self, other):
+        return isinstance(other, HashingVectorizer) and self.params() == other.params()
+
+    def params(self):
+        return {'n_buckets': self.n_buckets, 'signed': self.signed}
+
+    @classmethod
+    def from_params(cls, params):
+        return cls(params['n_buckets'], params['signed'])
+
+    def hashes(self, tokens):
+        # crc32 es estable entre procesos (hash() de Python usa una semilla aleatoria)
+        return np.fromiter((zlib.crc32(word.encode('utf-8')) for word in tokens),
+                           dtype=np.uint32, count=len(tokens))
+
+    def bucket_ids(self, tokens):
+        """Bucket de cada token, en orden"""
+        return (self.hashes(tokens) % self.n_buckets).astype(np.intp)
+
+    def count(self, tokens):
+        """Arreglos (buckets, conteos) del documento, solo con conteos distintos de cero"""
+        hashes = self.hashes(tokens)
+        buckets = (hashes % self.n_buckets).astype(np.intp)
+        if not self.signed:
+            return np.unique(buckets, return_counts=True)
+
+        signs = np.where(hashes & _SIGN_BIT, -1, 1)
+        buckets, inverse = np.unique(buckets, return_inverse=True)
+        counts = np.abs(np.bincount(inverse, weights=signs, minlength=len(buckets))).astype(np.int64)
+        keep = counts > 0
+        return buckets[keep], counts[keep]
+
+    def text_ids(self, text):
+        """Buckets de las palabras del texto crudo (mismo filtrado que tokenize)"""
+        return self.bucket_ids(tokenize(text)).tolist()
+
+    def text_ids_and_count(self, text):
+        """Buckets y número de palabras del texto limpio (incluye stopwords)"""
+        tokens, n_words = tokenize_and_count(text)
+        return self.bucket_ids(tokens).tolist(), n_words
@@ -0,0 +1,76 @@
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+import urllib.request
+
+NEWS_PATH = os.path.join("DataSet", "BBC News Summary", "BBC News Summary", "News Articles")
+
+def load_sample_texts(limit=200):
+    """Toma artículos del dataset como cuerpo de las peticiones"""
+    texts = []
+    for file_path in sorted(glob.glob(os.path.join(NEWS_PATH, "**", "*.txt"), recursive=True)):
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            texts.append(f.read())
+        if len(texts) >= limit:
+            break
+    return texts or ["The government announced new economic measures for the markets"]
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+def run_load_test(url, texts, concurrency, requests_per_client):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def client(client_id):
+        for i in range(requests_per_client):
+            body = json.dumps({"text": texts[(client_id + i) % len(texts)]}).encode("utf-8")
+            req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req) as response:
+                    response.read()
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total_time = time.perf_counter() - start
+
+    return latencies, errors, total_time
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga local para POST /classify")
+    parser.add_argument("--url", default="http://127.0.0.1:5000/classify")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=50, help="peticiones por cliente")
+    args = parser.parse_args()
+
+    texts = load_sample_texts()
+    latencies, errors, total_time = run_load_test(args.url, texts, args.concurrency, args.requests)
+
+    print("----------------PRUEBA DE CARGA----------------")
+    print(f"Peticiones exitosas: {len(latencies)}  Errores: {len(errors)}")
+    if latencies:
+        print(f"Throughput: {len(latencies) / total_time:.1f} peticiones/s")
+        for pct in (50, 95, 99):
+            print(f"p{pct}: {percentile(latencies, pct) * 1000:.1f} ms")
+    if errors:
+        print(f"Primer error: {errors[0]}")
+
+if __name__ == '__main__':
+    main()
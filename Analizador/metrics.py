@@ -0,0 +1,292 @@
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+WORD_BUCKETS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+RATIO_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+# Contadores e histogramas acumulados de los procesos ya terminados
+RETIRED_SNAPSHOT = 'retired.json'
+
+def _escape(value):
+    """Escapa \\, " y saltos de línea en el valor de una etiqueta (formato de texto)"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    return '{' + ','.join(parts) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Contador monótono con etiquetas"""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._values.items())
+
+    @staticmethod
+    def add(a, b):
+        return a + b
+
+    def render(self, series=None):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.snapshot() if series is None else series):
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """Histograma acumulativo con buckets fijos (formato Prometheus)"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return [(key, [list(counts), total, count])
+                    for key, (counts, total, count) in self._series.items()]
+
+    @staticmethod
+    def add(a, b):
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2]]
+
+    def render(self, series=None):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self.snapshot() if series is None else series):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                bucket_labels = key + (('le', _format_value(bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+class Gauge:
+    """Valor instantáneo calculado al exportar"""
+
+    def __init__(self, name, help_text, callback):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+
+    def snapshot(self):
+        return [(tuple(sorted(labels.items())), value) for labels, value in self.callback()]
+
+    @staticmethod
+    def add(a, b):
+        return a + b
+
+    def render(self, series=None):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        for key, value in sorted(self.snapshot() if series is None else series):
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+def merge_series(metric, snapshots):
+    """Suma por etiquetas las series de la métrica en varias instantáneas"""
+    merged = {}
+    for snapshot in snapshots:
+        for key, value in snapshot.get(metric.name, []):
+            merged[key] = metric.add(merged[key], value) if key in merged else value
+    return list(merged.items())
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def metrics(self):
+        return list(self._metrics)
+
+    def get(self, name):
+        return next(metric for metric in self._metrics if metric.name == name)
+
+    def snapshot(self):
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def render(self, snapshots=None):
+        """Texto de exportación; con snapshots, la suma de las instantáneas dadas"""
+        lines = []
+        for metric in self._metrics:
+            series = None if snapshots is None else merge_series(metric, snapshots)
+            lines.extend(metric.render(series))
+        return '\n'.join(lines) + '\n'
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def clear_snapshots(directory):
+    """Borra las instantáneas de una ejecución anterior (llamar antes de crear los procesos)"""
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        os.remove(path)
+
+class SharedMetrics:
+    """Métricas de varios procesos (gunicorn): cada proceso vuelca su registro en un
+    archivo JSON de un directorio común ({pid}-{ns}.json) y la exportación suma los de
+    todos. Al leer, los archivos de procesos terminados se retiran: sus contadores e
+    histogramas se suman a retired.json, para que los totales no retrocedan, y sus gauges
+    (p. ej. model_info) se descartan"""
+
+    def __init__(self, registry, directory):
+        self.registry = registry
+        self.directory = directory
+        self._pid = None
+        self._path = None
+        self._writer = None
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def path(self):
+        # Cada proceso (también tras un fork) escribe su propio archivo
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._path = os.path.join(self.directory, f"{self._pid}-{time.time_ns()}.json")
+        return self._path
+
+    def write(self):
+        """Vuelca la instantánea de este proceso (escritura atómica)"""
+        self._dump(self.registry.snapshot(), self.path)
+
+    @staticmethod
+    def _dump(snapshot, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _load(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return {name: [(tuple(tuple(pair) for pair in key), value) for key, value in series]
+                for name, series in data.items()}
+
+    @contextmanager
+    def _locked(self):
+        """Retiro y lectura exclusivos entre procesos: otro lector no puede ver a la vez
+        un archivo retirado y el retired.json que ya lo incluye"""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, '.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _dead_paths(self):
+        """Instantáneas de procesos terminados. Si el pid se reutilizó, solo la más
+        nueva de ese pid es del proceso vivo"""
+        by_pid = {}
+        for path in glob.glob(os.path.join(self.directory, '*-*.json')):
+            pid, stamp = os.path.basename(path)[:-len('.json')].split('-')
+            by_pid.setdefault(int(pid), []).append((int(stamp), path))
+        dead = []
+        for pid, paths in by_pid.items():
+            paths.sort()
+            dead.extend(path for _, path in (paths if not _pid_alive(pid) else paths[:-1]))
+        return dead
+
+    def _retire(self, paths):
+        retired_path = os.path.join(self.directory, RETIRED_SNAPSHOT)
+        snapshots = [snapshot for snapshot in map(self._load, [retired_path] + paths)
+                     if snapshot is not None]
+        self._dump({metric.name: merge_series(metric, snapshots)
+                    for metric in self.registry.metrics() if not isinstance(metric, Gauge)},
+                   retired_path)
+        for path in paths:
+            os.remove(path)
+
+    def read(self):
+        with self._locked():
+            dead = self._dead_paths()
+            if dead:
+                self._retire(dead)
+            snapshots = map(self._load, glob.glob(os.path.join(self.directory, '*.json')))
+            return [snapshot for snapshot in snapshots if snapshot is not None]
+
+    def series(self, name):
+        """Serie sumada de todos los procesos de una métrica"""
+        self.write()
+        return merge_series(self.registry.get(name), self.read())
+
+    def render(self):
+        self.write()
+        return self.registry.render(self.read())
+
+    def start_writing(self, interval=1.0):
+        """Hilo que vuelca la instantánea periódicamente, para que la exportación desde
+        otro proceso vea datos recientes"""
+        # Tras un fork el hilo heredado ya no está vivo y se debe iniciar otro
+        if self._writer is not None and self._writer.is_alive():
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write()
+                except OSError as e:
+                    print(f"Error guardando las métricas: {str(e)}")
+
+        self._writer = threading.Thread(target=loop, name="metrics-writer", daemon=True)
+        self._writer.start()
@@ -0,0 +1,320 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from compiled_model import HashedModel, MmapModel, load_model
+from model_store import ModelStore, version_file
+from tokenizer import token_ids_and_count
+
+DEFAULT_MODEL = 'default'
+VOCAB_ENTRY_BYTES = 120  # Estimación por palabra: str + entrada del dict word_index
+
+def own_lookup(model):
+    """Modelos que traducen palabras con su propia búsqueda y no entran al índice
+    compartido: con hashing no hay vocabulario, y el de un modelo mmap se consulta sobre
+    el arreglo mapeado (decodificarlo crearía una copia privada en cada proceso)"""
+    return isinstance(model, (HashedModel, MmapModel))
+
+def model_memory(model):
+    """Memoria aproximada del modelo: arreglos numpy + vocabulario"""
+    arrays = [model.log_priors, model.log_probs, model.word_counts, model.doc_counts,
+              getattr(model, 'scale', None), getattr(model, 'offset', None)]
+    if isinstance(model, MmapModel):
+        # Vocabulario de ancho fijo mapeado, sin diccionario palabra→columna
+        return sum(array.nbytes for array in arrays + [model.vocab_array] if array is not None)
+    return (sum(array.nbytes for array in arrays if array is not None) +
+            len(model.vocabulary) * VOCAB_ENTRY_BYTES)
+
+class SharedVocabulary:
+    """Índice palabra→id global compartido por todos los modelos del registro: el texto
+    se tokeniza una sola vez y cada modelo traduce los ids globales a sus columnas.
+    El índice solo crece (las palabras de un modelo descargado se conservan)"""
+
+    def __init__(self):
+        self.word_index = {}
+        self._lock = threading.Lock()
+
+    def columns_for(self, model):
+        """Arreglo id global → columna del modelo (-1 si no está en su vocabulario)"""
+        with self._lock:
+            for word in model.vocabulary:
+                self.word_index.setdefault(word, len(self.word_index))
+            columns = np.full(len(self.word_index), -1, dtype=np.intp)
+            columns[[self.word_index[word] for word in model.vocabulary]] = \
+                np.arange(len(model.vocabulary))
+        return columns
+
+class Document:
+    """Texto tokenizado una sola vez para todos los modelos que lo puntúan. Los ids del
+    índice compartido se calculan al primer uso: si todos los modelos de la petición
+    tienen búsqueda propia (hashing, mmap), no se tokeniza contra el índice compartido"""
+
+    def __init__(self, text, vocabulary):
+        self.text = text
+        self.vocabulary = vocabulary
+        self._global_ids = None
+        self._n_words = None
+
+    def _tokenize(self):
+        ids, self._n_words = token_ids_and_count(self.text, self.vocabulary.word_index)
+        self._global_ids = np.asarray(ids, dtype=np.intp)
+
+    @property
+    def global_ids(self):
+        if self._global_ids is None:
+            self._tokenize()
+        return self._global_ids
+
+    @property
+    def n_words(self):
+        if self._global_ids is None:
+            self._tokenize()
+        return self._n_words
+
+class ModelHandle:
+    """Referencia estable a un modelo publicado: se toma una por petición"""
+
+    def __init__(self, name, model, columns):
+        self.name = name
+        self.model = model
+        self.columns = columns  # None para modelos con búsqueda propia (hashing, mmap)
+
+    @property
+    def version(self):
+        return self.model.version
+
+    def text_ids_and_count(self, document):
+        """Como CompiledModel.text_ids_and_count, reutilizando la tokenización del documento"""
+        if self.columns is None:
+            return self.model.text_ids_and_count(document.text)
+        # Palabras agregadas al índice después de cargar este modelo: no son suyas
+        ids = document.global_ids[document.global_ids < len(self.columns)]
+        local = self.columns[ids]
+        return local[local >= 0].tolist(), document.n_words
+
+class ModelRegistry:
+    """Varios modelos servidos por un solo proceso, por nombre. Cada uno se carga al
+    primer uso con su propio ModelStore; si la memoria estimada supera el presupuesto
+    se descargan los menos usados recientemente. El modelo por defecto y los candidatos
+    en sombra se cargan al arrancar y nunca se descargan"""
+
+    def __init__(self, paths, default=DEFAULT_MODEL, memory_budget=0, shadows=None,
+                 loader=load_model):
+        self.paths = dict(paths)
+        self.default = default
+        self.memory_budget = memory_budget
+        # Modelo → candidato que se puntúa en sombra con las mismas peticiones
+        self.shadows = dict(shadows or {})
+        self.pinned = {default, *self.shadows.values()}
+        self.vocabulary = SharedVocabulary()
+        self.loader = loader
+        self.loads = 0
+        self.evictions = 0
+        # Estado de la carga del modelo por defecto (para /readyz)
+        self.load_error = None
+        self.load_seconds = None
+        self._load_done = threading.Event()
+
+        for name in [default, *self.shadows, *self.shadows.values()]:
+            if name not in self.paths:
+                raise ValueError(f"Modelo desconocido en la configuración: {name}")
+
+        self._stores = OrderedDict()  # Modelos cargados, del menos al más usado
+        self._handles = {}
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._watcher = None
+
+    @classmethod
+    def from_config(cls, path, memory_budget=None):
+        """Configuración JSON: {"default": nombre, "models": {nombre: ruta},
+        "shadow": {nombre: candidato}, "memory_budget_mb": N}. Las rutas relativas
+        se resuelven desde el directorio del archivo"""
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(path))
+        paths = {name: os.path.join(base_dir, model_path)
+                 for name, model_path in config['models'].items()}
+        if memory_budget is None:
+            memory_budget = int(config.get('memory_budget_mb', 0) * 1024 * 1024)
+        return cls(paths, config.get('default', DEFAULT_MODEL), memory_budget,
+                   config.get('shadow'))
+
+    def names(self):
+        return list(self.paths)
+
+    def load_default(self):
+        """Carga el modelo por defecto y registra el resultado para readiness(); después
+        carga los candidatos en sombra (su fallo no impide servir)"""
+        start = time.perf_counter()
+        try:
+            self.get()
+            self.load_seconds = time.perf_counter() - start
+            self.load_shadows()
+        except Exception as e:
+            self.load_error = str(e)
+            raise
+        finally:
+            self._load_done.set()
+
+    def load_shadows(self):
+        for name in sorted(set(self.shadows.values()) - {self.default}):
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"Error cargando el candidato en sombra {name}: {str(e)}")
+
+    def start_loading(self):
+        """Carga el modelo por defecto en segundo plano: el proceso puede responder
+        /healthz y /readyz mientras tanto"""
+        def load():
+            try:
+                self.load_default()
+            except Exception as e:
+                print(f"Error cargando el modelo {self.default}: {str(e)}")
+
+        threading.Thread(target=load, name="model-loader", daemon=True).start()
+
+    def wait_ready(self, timeout=None):
+        """Espera a que termine la carga inicial; True si el modelo por defecto quedó listo"""
+        self._load_done.wait(timeout)
+        return self.readiness() == 'ready'
+
+    def readiness(self):
+        """'ready' con el modelo por defecto cargado, 'failed' si su carga falló, si no 'loading'"""
+        with self._lock:
+            if self.default in self._handles:
+                return 'ready'
+        return 'failed' if self.load_error else 'loading'
+
+    def loaded(self, name):
+        """Handle del modelo solo si ya está cargado: no lo carga ni toca el orden LRU"""
+        with self._lock:
+            return self._handles.get(name)
+
+    def get(self, name=None):
+        """Handle del modelo (lo carga si hace falta). KeyError si el nombre no existe"""
+        name = name or self.default
+        if name not in self.paths:
+            raise KeyError(name)
+        with self._lock:
+            if name in self._handles:
+                self._stores.move_to_end(name)
+                return self._handles[name]
+
+        # Una carga a la vez; las peticiones a modelos ya cargados no esperan
+        with self._load_lock:
+            with self._lock:
+                if name in self._handles:
+                    return self._handles[name]
+            store = ModelStore(self.paths[name], self.loader)
+            store.reload()
+            handle = self._make_handle(name, store.current())
+            with self._lock:
+                self._stores[name] = store
+                self._publish(handle)
+                self.loads += 1
+                self._evict(keep=name)
+            if name == self.default:
+                self.load_error = None
+            return handle
+
+    def _make_handle(self, name, model):
+        columns = None if own_lookup(model) else self.vocabulary.columns_for(model)
+        return ModelHandle(name, model, columns)
+
+    def _publish(self, handle):
+        self._handles[handle.name] = handle
+        self._sizes[handle.name] = model_memory(handle.model)
+
+    def _evict(self, keep):
+        if self.memory_budget <= 0:
+            return
+        for name in list(self._stores):
+            if sum(self._sizes.values()) <= self.memory_budget:
+                return
+            if name in self.pinned or name == keep:
+                continue
+            del self._stores[name], self._handles[name], self._sizes[name]
+            self.evictions += 1
+
+    def reload(self, name=None):
+        """Recarga un modelo desde disco (si no estaba cargado, lo carga)"""
+        name = name or self.default
+        if name not in self.paths:
+            raise KeyError(name)
+        with self._lock:
+            store = self._stores.get(name)
+        if store is None:
+            return self.get(name).version
+        version = store.reload()
+        self._republish(name, store)
+        return version
+
+    def _republish(self, name, store):
+        handle = self._make_handle(name, store.current())
+        with self._lock:
+            # Pudo descargarse mientras se recargaba
+            if self._stores.get(name) is store:
+                self._publish(handle)
+                self._evict(keep=name)
+
+    def mark_changed(self, name):
+        """Actualiza la fecha del archivo del modelo: los vigilantes de todos los procesos
+        que lo tienen cargado lo recargan en su próxima revisión"""
+        os.utime(version_file(self.paths[name]))
+
+    def reload_if_changed(self):
+        """Recarga los modelos cargados cuyo archivo cambió; devuelve {nombre: versión}"""
+        with self._lock:
+            stores = list(self._stores.items())
+        reloaded = {}
+        for name, store in stores:
+            try:
+                version = store.reload_if_changed()
+            except Exception as e:
+                print(f"Error recargando el modelo {name}: {str(e)}")
+                continue
+            if version:
+                self._republish(name, store)
+                reloaded[name] = version
+        return reloaded
+
+    def start_watching(self, interval=5.0):
+        """Un solo hilo revisa en segundo plano los archivos de todos los modelos cargados"""
+        # Tras un fork el hilo heredado ya no está vivo y se debe iniciar otro
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                for name, version in self.reload_if_changed().items():
+                    print(f"Modelo {name} recargado: versión {version}")
+
+        self._watcher = threading.Thread(target=watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stats(self):
+        with self._lock:
+            loaded = {name: (self._handles[name].version, self._sizes[name])
+                      for name in self._stores}
+            memory = sum(self._sizes.values())
+        return {
+            'default': self.default,
+            'memory_bytes': memory,
+            'memory_budget_bytes': self.memory_budget,
+            'loads': self.loads,
+            'evictions': self.evictions,
+            'shared_vocabulary': len(self.vocabulary.word_index),
+            'models': {
+                name: {'loaded': name in loaded,
+                       'model_version': loaded[name][0] if name in loaded else None,
+                       'memory_bytes': loaded[name][1] if name in loaded else 0,
+                       'shadow': self.shadows.get(name)}
+                for name in self.paths
+            },
+        }
@@ -0,0 +1,71 @@
+import os
+import threading
+import numpy as np
+from compiled_model import load_model
+from fingerprints import file_digest
+
+def version_file(path):
+    """Archivo que identifica la versión: el pickle o el meta.json del directorio mmap"""
+    if os.path.isdir(path):
+        return os.path.join(path, 'meta.json')
+    return path
+
+def file_version(path):
+    """Versión del modelo: prefijo del SHA-256 del archivo (meta.json para mmap)"""
+    return file_digest(version_file(path))[:12]
+
+def validate_model(model):
+    """Verifica que el modelo nuevo pueda servir antes de publicarlo"""
+    if not model.categories:
+        raise ValueError("Modelo inválido: no tiene categorías")
+    if not np.all(np.isfinite(model.log_priors)) or not np.all(np.isfinite(model.log_probs)):
+        raise ValueError("Modelo inválido: contiene probabilidades no finitas")
+    # Clasificación de prueba con un documento vacío
+    model.rank(model.score_ids([]))
+
+class ModelStore:
+    """Mantiene el modelo activo y lo reemplaza atómicamente al recargarlo.
+    Cada petición toma una sola referencia con current(), así que siempre ve
+    un modelo consistente aunque haya una recarga en curso"""
+
+    def __init__(self, path, loader=load_model):
+        self.path = path
+        self.loader = loader
+        self._model = None
+        self._stat = None
+        self._failed_stat = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        return self._model
+
+    def _file_stat(self, path=None):
+        stat = os.stat(version_file(path or self.path))
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def reload(self):
+        """Carga y valida el modelo del disco; si falla se conserva el anterior"""
+        with self._lock:
+            # Un directorio mmap es un enlace a su versión: se resuelve una vez para que
+            # la versión registrada sea la de los arreglos cargados
+            path = os.path.realpath(self.path)
+            stat = self._file_stat(path)
+            model = self.loader(path)
+            validate_model(model)
+            model.version = file_version(path)
+
+            # Publicación atómica: una sola asignación de referencia
+            self._model = model
+            self._stat = stat
+            return model.version
+
+    def reload_if_changed(self):
+        stat = self._file_stat()
+        # No reintentar un archivo que ya falló hasta que vuelva a cambiar
+        if stat == self._stat or stat == self._failed_stat:
+            return None
+        try:
+            return self.reload()
+        except Exception:
+            self._failed_stat = stat
+            raise
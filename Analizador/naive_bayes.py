@@ -3,32 +3,40 @@ from collections import defaultdict
 import numpy as np
 
 class NaiveBayesClassifier:
-    def __init__(self):
+    def __init__(self, alpha=1.0):
+        self.alpha = alpha  # Suavizado aditivo (1 = Laplace)
         self.class_probs = {}
         self.word_probs = {}
         self.vocabulary = set()
         self.class_word_counts = {}
         self.class_total_words = {}
+        self.class_doc_counts = {}
     
     def train(self, train_set):
         """Entrenamiento mejorado con verificación de datos"""
         # Reinicializar estructuras
         self.class_probs = {}
         self.word_probs = {}
+        self.vocabulary = set()
         self.class_word_counts = {}
         self.class_total_words = {}
-        
-        # Contar documentos por clase
-        class_counts = defaultdict(int)
-        total_docs = len(train_set)
+        self.class_doc_counts = {}
         
         # Verificación inicial
-        if total_docs == 0:
+        if len(train_set) == 0:
+            raise ValueError("El conjunto de entrenamiento está vacío")
+        
+        self.partial_fit(train_set)
+    
+    def partial_fit(self, train_set):
+        """Actualiza los conteos con documentos nuevos sin recorrer el corpus anterior"""
+        train_set = list(train_set)
+        if not train_set and not self.class_doc_counts:
             raise ValueError("El conjunto de entrenamiento está vacío")
         
-        # Primera pasada: contar documentos y palabras
+        # Contar documentos y palabras de los nuevos datos
         for features, category in train_set:
-            class_counts[category] += 1
+            self.class_doc_counts[category] = self.class_doc_counts.get(category, 0) + 1
             
             if category not in self.class_word_counts:
                 self.class_word_counts[category] = defaultdict(int)
@@ -40,19 +48,66 @@ class NaiveBayesClassifier:
                     self.class_total_words[category] += count
                     self.vocabulary.add(word)
         
+        self._update_probs()
+    
+    def merge(self, other):
+        """Suma los conteos de otro clasificador entrenado con otros documentos.
+        Naïve Bayes es aditivo: el resultado es igual a entrenar con ambos conjuntos"""
+        if not other.class_doc_counts:
+            return self
+        
+        for category, doc_count in other.class_doc_counts.items():
+            self.class_doc_counts[category] = self.class_doc_counts.get(category, 0) + doc_count
+            
+            if category not in self.class_word_counts:
+                self.class_word_counts[category] = defaultdict(int)
+                self.class_total_words[category] = 0
+            
+            for word, count in other.class_word_counts[category].items():
+                self.class_word_counts[category][word] += count
+            self.class_total_words[category] += other.class_total_words[category]
+        
+        self.vocabulary |= other.vocabulary
+        self._update_probs()
+        return self
+    
+    def _update_probs(self):
+        """Deriva P(c) y P(w|c) (suavizado aditivo, Laplace por defecto) a partir de los conteos"""
+        total_docs = sum(self.class_doc_counts.values())
+        
         # Calcular probabilidades a priori P(c)
-        for category, count in class_counts.items():
+        self.class_probs = {}
+        for category, count in self.class_doc_counts.items():
             self.class_probs[category] = count / total_docs
         
         # Calcular probabilidades condicionales P(w|c) con suavizado Laplace
         vocab_size = len(self.vocabulary)
-        for category in class_counts:
+        self.word_probs = {}
+        for category in self.class_doc_counts:
             self.word_probs[category] = {}
             total_words = self.class_total_words[category]
             
             for word in self.vocabulary:
                 count = self.class_word_counts[category].get(word, 0)
-                self.word_probs[category][word] = (count + 1) / (total_words + vocab_size)
+                self.word_probs[category][word] = (count + self.alpha) / (total_words + self.alpha * vocab_size)
+    
+    @classmethod
+    def from_counts(cls, categories, vocabulary, word_counts, doc_counts, alpha=1.0):
+        """Reconstruye el clasificador desde los conteos crudos guardados en el modelo"""
+        classifier = cls(alpha)
+        for row, category in enumerate(categories):
+            classifier.class_doc_counts[category] = int(doc_counts[row])
+            classifier.class_word_counts[category] = defaultdict(int)
+            classifier.class_total_words[category] = 0
+            
+            for word, count in zip(vocabulary, word_counts[row]):
+                if count > 0:
+                    classifier.class_word_counts[category][word] = int(count)
+                    classifier.class_total_words[category] += int(count)
+                    classifier.vocabulary.add(word)
+        
+        classifier._update_probs()
+        return classifier
     
     def predict(self, features):
         """Predicción con verificación de entradas"""
@@ -0,0 +1,147 @@
+import json
+import random
+from collections import Counter, defaultdict
+import numpy as np
+
+from compiled_model import model_from_counts
+from preprocess_bbc_dataset import (CATEGORIES, TEST_SIZE, SEED, VOCAB_SIZE, DOC_CHUNK_SIZE,
+                                    iter_corpus_tokens)
+from tokenizer import tokenize
+
+FLUSH_TOKENS = 1_000_000  # Tokens acumulados antes de sumarlos a la matriz de conteos
+
+def iter_raw_sources(categories=CATEGORIES, workers=1):
+    """(categoría, tokens) por archivo de News Articles y Summaries, categoría por
+    categoría, en el mismo orden en que preprocess_bbc_dataset los concatena.
+    Con workers > 1 se usa un solo pool por pasada"""
+    return iter_corpus_tokens(categories, workers)
+
+def iter_jsonl_sources(path, categories=CATEGORIES, start=0, stop=None):
+    """(categoría, tokens) por línea de un JSONL con {"text": ..., "category": ...}.
+    Con start/stop solo se leen los registros [start, stop) (sin contar líneas vacías)"""
+    with open(path, "r", encoding="utf-8") as f:
+        index = -1
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            index += 1
+            if index < start:
+                continue
+            if stop is not None and index >= stop:
+                return
+            try:
+                item = json.loads(line)
+            except ValueError:
+                raise ValueError(f"Línea {number}: JSON inválido")
+            if not isinstance(item, dict) or not isinstance(item.get('text'), str):
+                raise ValueError(f'Línea {number}: se esperaba un objeto con "text" y "category"')
+            if item.get('category') not in categories:
+                raise ValueError(f"Línea {number}: categoría inválida: {item.get('category')}")
+            yield item['category'], tokenize(item['text'])
+
+def iter_documents(sources, chunk_size=DOC_CHUNK_SIZE):
+    """Parte el texto de cada categoría en pseudo-documentos de chunk_size palabras.
+    Genera (categoría, número de documento en la categoría, tokens); cada categoría
+    guarda solo las palabras que aún no completan un documento"""
+    pending = defaultdict(list)
+    emitted = defaultdict(int)
+    for category, tokens in sources:
+        buffer = pending[category]
+        buffer.extend(tokens)
+        start = 0
+        while len(buffer) - start >= chunk_size:
+            yield category, emitted[category], buffer[start:start + chunk_size]
+            emitted[category] += 1
+            start += chunk_size
+        del buffer[:start]
+
+    for category, buffer in pending.items():
+        if buffer:
+            yield category, emitted[category], buffer
+
+def scan_corpus(sources, categories=CATEGORIES, vocab_size=VOCAB_SIZE,
+                chunk_size=DOC_CHUNK_SIZE):
+    """Primera pasada: vocabulario (top vocab_size) y documentos por categoría.
+    Las frecuencias se llevan por categoría y se combinan en el orden de categories,
+    así los empates se resuelven igual que Counter(all_words) en prepare_ml_datasets"""
+    frequencies = {category: Counter() for category in categories}
+    token_counts = dict.fromkeys(categories, 0)
+    for category, tokens in sources:
+        frequencies[category].update(tokens)
+        token_counts[category] += len(tokens)
+
+    combined = Counter()
+    for category in categories:
+        combined.update(frequencies[category])
+    vocabulary = [word for word, _ in combined.most_common(vocab_size)]
+
+    doc_counts = [-(-token_counts[category] // chunk_size) for category in categories]
+    return vocabulary, doc_counts
+
+def shuffled_indices(n, seed=SEED):
+    """Permutación de range(n) idéntica a random.Random(seed).shuffle, sobre un arreglo
+    numpy (8 bytes por elemento en lugar de un int de Python por elemento)"""
+    order = np.arange(n, dtype=np.int64)
+    rng = random.Random(seed)
+    # Mismo Fisher-Yates y mismos números aleatorios que random.shuffle
+    for i in range(n - 1, 0, -1):
+        j = rng.randrange(i + 1)
+        order[i], order[j] = order[j], order[i]
+    return order
+
+def train_split(doc_counts, seed=SEED):
+    """Marca los documentos de entrenamiento con la misma permutación que
+    random.shuffle(features) en prepare_ml_datasets. Devuelve la máscara y el orden
+    en que aparece cada categoría entre los documentos de entrenamiento"""
+    n_docs = int(sum(doc_counts))
+    train_docs = shuffled_indices(n_docs, seed)[:int(n_docs * (1 - TEST_SIZE))]
+
+    is_train = np.zeros(n_docs, dtype=bool)
+    is_train[train_docs] = True
+
+    # NaiveBayesClassifier conserva el orden de primera aparición de las clases
+    offsets = np.cumsum(doc_counts)
+    doc_category = np.searchsorted(offsets, train_docs, side='right')
+    _, first = np.unique(doc_category, return_index=True)
+    category_order = [int(doc_category[idx]) for idx in sorted(first)]
+    return is_train, category_order
+
+def train_out_of_core(make_sources, categories=CATEGORIES, vocab_size=VOCAB_SIZE,
+                      chunk_size=DOC_CHUNK_SIZE, seed=SEED, alpha=1.0):
+    """Entrena en dos pasadas sobre el texto crudo sin materializar el dataset.
+    make_sources() debe devolver un iterador nuevo de (categoría, tokens) en cada llamada.
+    Con las mismas opciones produce el mismo modelo que preprocesar + train_model"""
+    vocabulary, doc_counts = scan_corpus(make_sources(), categories, vocab_size, chunk_size)
+    is_train, category_order = train_split(doc_counts, seed)
+    offsets = dict(zip(categories, np.concatenate(([0], np.cumsum(doc_counts)[:-1]))))
+
+    # Segunda pasada: conteos clase×palabra de los documentos de entrenamiento
+    word_index = {word: idx for idx, word in enumerate(vocabulary)}
+    category_index = {category: idx for idx, category in enumerate(categories)}
+    n_cells = len(categories) * len(vocabulary)
+    word_counts = np.zeros(n_cells, dtype=np.int64)
+    train_docs = np.zeros(len(categories), dtype=np.int64)
+
+    # Celdas (clase, palabra) aplanadas; se suman por lotes con un solo bincount
+    cells = []
+    for category, number, tokens in iter_documents(make_sources(), chunk_size):
+        if not is_train[offsets[category] + number]:
+            continue
+        row = category_index[category]
+        base = row * len(vocabulary)
+        cells.extend(base + idx for idx in map(word_index.get, tokens) if idx is not None)
+        train_docs[row] += 1
+        if len(cells) >= FLUSH_TOKENS:
+            word_counts += np.bincount(cells, minlength=n_cells)
+            cells = []
+    word_counts += np.bincount(np.asarray(cells, dtype=np.intp), minlength=n_cells)
+    word_counts = word_counts.reshape(len(categories), len(vocabulary))
+
+    # Mismo orden de clases y vocabulario ordenado que save_model
+    seen = word_counts[category_order].sum(axis=0) > 0
+    columns = sorted(np.flatnonzero(seen), key=lambda idx: vocabulary[idx])
+    return model_from_counts([categories[row] for row in category_order],
+                             [vocabulary[idx] for idx in columns],
+                             word_counts[np.ix_(category_order, columns)],
+                             train_docs[category_order], alpha)
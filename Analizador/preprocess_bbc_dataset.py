@@ -1,72 +1,100 @@
 import os
-import re
 import csv
 import glob
 import random
-from collections import Counter, defaultdict
+import argparse
+import multiprocessing
+from collections import Counter
+import numpy as np
+from fingerprints import file_digest, files_fingerprint, fingerprint, fresh_stamp, write_stamp
+from hashing import HashingVectorizer
+from sparse_dataset import SparseDataset, from_features, save_sparse_dataset, take_rows
+from token_cache import TokenCache, tokenizer_fingerprint
+from tokenizer import tokenize
 
 # Rutas
 NEWS_PATH = os.path.join("DataSet", "BBC News Summary", "BBC News Summary", "News Articles")
 SUMMARIES_PATH = os.path.join("DataSet", "BBC News Summary", "BBC News Summary", "Summaries")
 CATEGORIES = ["business", "entertainment", "politics", "sport", "tech"]
 TEST_SIZE = 0.2  # 20% para el test
+INGEST_CHUNK_SIZE = 64  # Archivos por bloque enviado a cada proceso
+VOCAB_SIZE = 5000
+DOC_CHUNK_SIZE = 100  # Palabras por pseudo-documento
 SEED = 42
+OUTPUT_DIR = os.path.join("Analizador", "preprocessed")
+STAMP_PATH = os.path.join(OUTPUT_DIR, "preprocess.stamp.json")
+KEYWORDS_PATH = "palabras_por_categoria.csv"
 random.seed(SEED)
 
-# Lista de stopwords
-STOPWORDS = {
-    "a", "about", "above", "after", "again", "against", "all", "am", "an", "and",
-    "any", "are", "aren't", "as", "at", "be", "because", "been", "before",
-    "being", "below", "between", "both", "but", "by", "can't", "cannot",
-    "could", "couldn't", "did", "didn't", "do", "does", "doesn't", "doing",
-    "don't", "down", "during", "each", "few", "for", "from", "further",
-    "had", "hadn't", "has", "hasn't", "have", "haven't", "having", "he",
-    "he'd", "he'll", "he's", "her", "here", "here's", "hers", "herself",
-    "him", "himself", "his", "how", "how's", "i", "i'd", "i'll", "i'm",
-    "i've", "if", "in", "into", "is", "isn't", "it", "it's", "its",
-    "itself", "let's", "me", "more", "most", "mustn't", "my", "myself",
-    "no", "nor", "not", "of", "off", "on", "once", "only", "or", "other",
-    "ought", "our", "ours", "ourselves", "out", "over", "own", "same",
-    "shan't", "she", "she'd", "she'll", "she's", "should", "shouldn't",
-    "so", "some", "such", "than", "that", "that's", "the", "their",
-    "theirs", "them", "themselves", "then", "there", "there's", "these",
-    "they", "they'd", "they'll", "they're", "they've", "this", "those",
-    "through", "to", "too", "under", "until", "up", "very", "was", "wasn't",
-    "we", "we'd", "we'll", "we're", "we've", "were", "weren't", "what",
-    "what's", "when", "when's", "where", "where's", "which", "while", "who",
-    "who's", "whom", "why", "why's", "with", "won't", "would", "wouldn't",
-    "you", "you'd", "you'll", "you're", "you've", "your", "yours",
-    "yourself", "yourselves"
-}
-
-def preprocess_text(text):
-    """Preprocesamiento completo del texto"""
-    text = text.lower()
-    text = re.sub(r'[^a-z\s]', '', text)
-    
-    # Tokenización y filtrado
-    words = text.split()
-    return [word for word in words 
-            if word not in STOPWORDS 
-            and len(word) > 2  
-            and word.isalpha()] 
-
-def process_category_files(base_path, categories):
+def read_and_tokenize(file_path):
+    """Lee y tokeniza un archivo; devuelve lista vacía si está vacío o falla"""
+    try:
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as file:
+            content = file.read().strip()
+            if content:
+                return tokenize(content)
+    except Exception as e:
+        print(f"Error procesando {file_path}: {str(e)}")
+    return []
+
+def list_category_files(base_path, category):
+    search_path = os.path.join(base_path, category, "**/*.txt")
+    return glob.glob(search_path, recursive=True)
+
+def source_files(categories=CATEGORIES):
+    """Archivos de News Articles y Summaries en el orden en que se recorren"""
+    return [file_path
+            for base_path in (NEWS_PATH, SUMMARIES_PATH)
+            for category in categories
+            for file_path in list_category_files(base_path, category)]
+
+def iter_category_tokens(base_path, categories, workers=1, chunk_size=INGEST_CHUNK_SIZE,
+                         cache=None):
+    """Genera (categoría, tokens) por archivo en el mismo orden que el recorrido serial.
+    Con cache (TokenCache ya actualizado) los tokens salen del caché sin leer los archivos"""
+    jobs = [(category, file_path)
+            for category in categories
+            for file_path in list_category_files(base_path, category)]
+
+    if cache is not None:
+        for category, file_path in jobs:
+            yield category, cache.tokens_for(file_path)
+        return
+    yield from iter_file_tokens(jobs, workers, chunk_size)
+
+def corpus_jobs(categories=CATEGORIES):
+    """(categoría, archivo) categoría por categoría: News Articles y luego Summaries de cada una"""
+    return [(category, file_path)
+            for category in categories
+            for base_path in (NEWS_PATH, SUMMARIES_PATH)
+            for file_path in list_category_files(base_path, category)]
+
+def iter_corpus_tokens(categories=CATEGORIES, workers=1, chunk_size=INGEST_CHUNK_SIZE):
+    """(categoría, tokens) por archivo en el orden de corpus_jobs, con un solo pool de
+    procesos para todo el recorrido"""
+    yield from iter_file_tokens(corpus_jobs(categories), workers, chunk_size)
+
+def iter_file_tokens(jobs, workers=1, chunk_size=INGEST_CHUNK_SIZE):
+    """Tokeniza los archivos de jobs [(categoría, ruta)] en orden. Con workers > 1 se
+    reparten en bloques a un pool de procesos y los resultados se consumen a medida
+    que llegan (imap ordenado)"""
+    if workers <= 1:
+        for category, file_path in jobs:
+            yield category, read_and_tokenize(file_path)
+        return
+
+    with multiprocessing.Pool(processes=workers) as pool:
+        file_paths = (file_path for _, file_path in jobs)
+        results = pool.imap(read_and_tokenize, file_paths, chunksize=chunk_size)
+        for (category, _), tokens in zip(jobs, results):
+            yield category, tokens
+
+def process_category_files(base_path, categories, workers=1, cache=None):
     """Procesa todos los archivos por categoría"""
     category_data = {category: [] for category in categories}
     
-    for category in categories:
-        search_path = os.path.join(base_path, category, "**/*.txt")
-        
-        for file_path in glob.glob(search_path, recursive=True):
-            try:
-                with open(file_path, "r", encoding="utf-8", errors="ignore") as file:
-                    content = file.read().strip()
-                    if content:
-                        tokens = preprocess_text(content)
-                        category_data[category].extend(tokens)
-            except Exception as e:
-                print(f"Error procesando {file_path}: {str(e)}")
+    for category, tokens in iter_category_tokens(base_path, categories, workers, cache=cache):
+        category_data[category].extend(tokens)
     
     return category_data
 
@@ -81,23 +109,24 @@ def generate_keywords_analysis(category_data, top_n=150):
     
     return keywords_output
 
-def prepare_ml_datasets(category_data, vocab_size=5000):
+def prepare_ml_datasets(category_data, vocab_size=VOCAB_SIZE, chunk_size=DOC_CHUNK_SIZE):
     """Generando los dataset """
     # Crear documentos 
     documents = []
     for category, words in category_data.items():
-        documents.extend([(words[i:i+100], category) for i in range(0, len(words), 100)])
+        documents.extend([(words[i:i+chunk_size], category)
+                          for i in range(0, len(words), chunk_size)])
     
     # Construir vocabulario
     all_words = [word for words, _ in documents for word in words]
     vocabulary = [word for word, _ in Counter(all_words).most_common(vocab_size)]
     
-    # Crear vectores de características
+    # Crear vectores de características (solo palabras del vocabulario con conteo > 0)
     features = []
     vocab_set = set(vocabulary)
     for words, category in documents:
-        word_counts = Counter(words)
-        features.append(({word: word_counts[word] for word in vocabulary}, category))
+        word_counts = Counter(word for word in words if word in vocab_set)
+        features.append((word_counts, category))
     
     # Dividir en train/test manteniendo proporción por categoría
     random.shuffle(features)
@@ -106,43 +135,168 @@ def prepare_ml_datasets(category_data, vocab_size=5000):
     
     return vocabulary, train_set, test_set
 
+def iter_hashed_documents(categories, vectorizer, workers=1, chunk_size=DOC_CHUNK_SIZE):
+    """Genera (categoría, buckets, conteos) por pseudo-documento, en el mismo orden que
+    prepare_ml_datasets, sin acumular el corpus: solo se guardan las palabras que aún
+    no completan un documento de la categoría en curso"""
+    current, pending = None, []
+    for category, tokens in iter_corpus_tokens(categories, workers):
+        if category != current:
+            if pending:
+                yield (current, *vectorizer.count(pending))
+            current, pending = category, []
+        pending.extend(tokens)
+        start = 0
+        while len(pending) - start >= chunk_size:
+            yield (category, *vectorizer.count(pending[start:start + chunk_size]))
+            start += chunk_size
+        pending = pending[start:]
+    if pending:
+        yield (current, *vectorizer.count(pending))
+
+def prepare_hashed_datasets(categories, vectorizer, workers=1, chunk_size=DOC_CHUNK_SIZE):
+    """Como prepare_ml_datasets, pero sin vocabulario global: las columnas son buckets"""
+    indptr = [0]
+    indices = []
+    data = []
+    labels = []
+    for category, buckets, counts in iter_hashed_documents(categories, vectorizer,
+                                                           workers, chunk_size):
+        indices.append(buckets)
+        data.append(counts)
+        indptr.append(indptr[-1] + len(buckets))
+        labels.append(category)
+
+    sparse = SparseDataset([], indptr,
+                           np.concatenate(indices) if indices else [],
+                           np.concatenate(data) if data else [],
+                           labels, vectorizer)
+
+    # Misma permutación que random.shuffle(features) en prepare_ml_datasets
+    order = list(range(len(sparse)))
+    random.shuffle(order)
+    split_idx = int(len(order) * (1 - TEST_SIZE))
+    return take_rows(sparse, order[:split_idx]), take_rows(sparse, order[split_idx:])
+
 def save_keywords_analysis(keywords_output):
-    with open("palabras_por_categoria.csv", "w", newline="", encoding="utf-8") as f:
+    with open(KEYWORDS_PATH, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
         writer.writerow(["Categoría", "Palabra", "Frecuencia"])
         writer.writerows(keywords_output)
 
-def save_ml_datasets(vocabulary, train_set, test_set):
-    # Crear directorio si no existe
-    os.makedirs(os.path.join("Analizador", "preprocessed"), exist_ok=True)
-    
-    # Guardar train dataset
-    train_path = os.path.join("Analizador", "preprocessed", "train_dataset.csv")
-    with open(train_path, "w", newline="", encoding="utf-8") as f:
+def save_csv_dataset(path, vocabulary, dataset):
+    """Exporta el dataset denso en CSV (una columna por palabra del vocabulario)"""
+    with open(path, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
         writer.writerow(vocabulary + ["category"])
-        for features, category in train_set:
-            writer.writerow(list(features.values()) + [category])
+        for features, category in dataset:
+            writer.writerow([features.get(word, 0) for word in vocabulary] + [category])
+
+def save_ml_datasets(vocabulary, train_set, test_set, export_csv=False):
+    # Crear directorio si no existe
+    output_dir = OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
     
-    # Guardar test dataset
-    test_path = os.path.join("Analizador", "preprocessed", "test_dataset.csv")
-    with open(test_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(vocabulary + ["category"])
-        for features, category in test_set:
-            writer.writerow(list(features.values()) + [category])
+    # Guardar train/test en formato disperso (CSR en .npz)
+    save_sparse_dataset(os.path.join(output_dir, "train_dataset.npz"),
+                        from_features(vocabulary, train_set))
+    save_sparse_dataset(os.path.join(output_dir, "test_dataset.npz"),
+                        from_features(vocabulary, test_set))
+    
+    # Exportación CSV opcional
+    if export_csv:
+        save_csv_dataset(os.path.join(output_dir, "train_dataset.csv"), vocabulary, train_set)
+        save_csv_dataset(os.path.join(output_dir, "test_dataset.csv"), vocabulary, test_set)
     
     # Guardar vocabulario
-    vocab_path = os.path.join("Analizador", "preprocessed", "vocabulary.txt")
+    vocab_path = os.path.join(output_dir, "vocabulary.txt")
     with open(vocab_path, "w", encoding="utf-8") as f:
         f.write("\n".join(vocabulary))
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Preprocesa el dataset BBC News Summary")
+    parser.add_argument("--csv", action="store_true",
+                        help="exporta también train/test en CSV denso")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="procesos para leer y tokenizar archivos (1 = serial)")
+    parser.add_argument("--vocab-size", type=int, default=VOCAB_SIZE,
+                        help="palabras más frecuentes que forman el vocabulario")
+    parser.add_argument("--chunk-size", type=int, default=DOC_CHUNK_SIZE,
+                        help="palabras por pseudo-documento")
+    parser.add_argument("--hashing", type=int, metavar="BUCKETS",
+                        help="usa feature hashing con BUCKETS columnas en lugar de vocabulario")
+    parser.add_argument("--signed", action="store_true",
+                        help="con --hashing, signo alternado por palabra para compensar colisiones")
+    parser.add_argument("--force", action="store_true",
+                        help="regenera los artefactos aunque las entradas no hayan cambiado")
+    return parser.parse_args()
+
+def output_files(args):
+    """Artefactos que genera la corrida con estas opciones"""
+    names = ["train_dataset.npz", "test_dataset.npz"]
+    if not args.hashing:
+        names.append("vocabulary.txt")
+        if args.csv:
+            names += ["train_dataset.csv", "test_dataset.csv"]
+    outputs = [os.path.join(OUTPUT_DIR, name) for name in names]
+    return outputs if args.hashing else outputs + [KEYWORDS_PATH]
+
+def refresh_cache(paths, workers=1):
+    """Actualiza el caché de tokens: solo se tokenizan archivos nuevos o modificados"""
+    cache = TokenCache()
+    reused, tokenized = cache.refresh(paths, workers)
+    cache.save()
+    print(f"Caché de tokens: {reused} archivos reutilizados, {tokenized} tokenizados")
+    return cache
+
+def preprocess_inputs(args, paths, digest=file_digest):
+    """Huella de las entradas de esta corrida: contenido de los archivos y opciones"""
+    hashing = HashingVectorizer(args.hashing, args.signed).params() if args.hashing else None
+    return fingerprint('preprocess', tokenizer_fingerprint(), files_fingerprint(paths, digest),
+                       args.vocab_size, args.chunk_size, SEED, TEST_SIZE, args.csv, hashing)
+
+def hashed_main(args, inputs):
+    """Preprocesamiento con feature hashing: memoria acotada, sin pasada de vocabulario"""
+    vectorizer = HashingVectorizer(args.hashing, args.signed)
+    print(f"Procesando News Articles y Summaries con hashing ({vectorizer.n_buckets} buckets"
+          f"{', con signo' if vectorizer.signed else ''})...")
+    train_set, test_set = prepare_hashed_datasets(CATEGORIES, vectorizer, args.workers,
+                                                  args.chunk_size)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    save_sparse_dataset(os.path.join(OUTPUT_DIR, "train_dataset.npz"), train_set)
+    save_sparse_dataset(os.path.join(OUTPUT_DIR, "test_dataset.npz"), test_set)
+    write_stamp(STAMP_PATH, inputs, output_files(args))
+
+    print("\n----------------ARCHIVOS GENERADOS----------------")
+    print("1. Analizador/preprocessed/train_dataset.npz")
+    print(f"   - {len(train_set)} documentos de entrenamiento")
+    print("2. Analizador/preprocessed/test_dataset.npz")
+    print(f"   - {len(test_set)} documentos de prueba")
+    print("(Sin vocabulary.txt ni análisis de palabras clave: el modo hashing no guarda palabras)")
+    print("\nProceso completado exitosamente!")
+
 def main():
+    args = parse_args()
+    paths = source_files()
+    # Con hashing los tokens se leen en streaming sin el caché, para no cargar el
+    # corpus en memoria; la huella de entradas se calcula archivo por archivo
+    cache = None if args.hashing else refresh_cache(paths, args.workers)
+    inputs = preprocess_inputs(args, paths, cache.digest if cache else file_digest)
+    if not args.force and fresh_stamp(STAMP_PATH, inputs):
+        print("Sin cambios en los archivos ni en las opciones: los artefactos están al día")
+        print("(usa --force para regenerarlos)")
+        return
+    
+    if args.hashing:
+        hashed_main(args, inputs)
+        return
+
     print("Procesando News Articles...")
-    news_data = process_category_files(NEWS_PATH, CATEGORIES)
+    news_data = process_category_files(NEWS_PATH, CATEGORIES, cache=cache)
     
     print("Procesando Summaries...")
-    summaries_data = process_category_files(SUMMARIES_PATH, CATEGORIES)
+    summaries_data = process_category_files(SUMMARIES_PATH, CATEGORIES, cache=cache)
     
     # Combinar datos de ambas fuentes
     combined_data = {category: news_data[category] + summaries_data[category] 
@@ -155,17 +309,21 @@ def main():
     
     # Paso 3: Preparar datasets para ML
     print("Preparando datasets para machine learning...")
-    vocabulary, train_set, test_set = prepare_ml_datasets(combined_data)
-    save_ml_datasets(vocabulary, train_set, test_set)
+    vocabulary, train_set, test_set = prepare_ml_datasets(combined_data, args.vocab_size,
+                                                          args.chunk_size)
+    save_ml_datasets(vocabulary, train_set, test_set, export_csv=args.csv)
+    write_stamp(STAMP_PATH, inputs, output_files(args))
     
     # Resultados
     print("\n----------------ARCHIVOS GENERADOS----------------")
     print("1. palabras_por_categoria.csv")
     print("   - Top 150 palabras por categoria")
-    print("2. Analizador/preprocessed/train_dataset.csv")
+    print("2. Analizador/preprocessed/train_dataset.npz")
     print(f"   - {len(train_set)} documentos de entrenamiento")
-    print("3. Analizador/preprocessed/test_dataset.csv")
+    print("3. Analizador/preprocessed/test_dataset.npz")
     print(f"   - {len(test_set)} documentos de prueba")
+    if args.csv:
+        print("   - Exportados también en train_dataset.csv y test_dataset.csv")
     print("4. Analizador/preprocessed/vocabulary.txt")
     print(f"   - {len(vocabulary)} palabras en el vocabulario")
     print("\nProceso completado exitosamente!")
@@ -0,0 +1,107 @@
+import argparse
+import os
+import shutil
+import tempfile
+import multiprocessing
+
+DEFAULT_WATCH_INTERVAL = 2.0
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Servidor de producción de la API (gunicorn)")
+    parser.add_argument("--bind", default=os.environ.get("BIND", "0.0.0.0:5000"),
+                        help="dirección host:puerto")
+    parser.add_argument("--workers", type=int,
+                        default=int(os.environ.get("WORKERS", multiprocessing.cpu_count())),
+                        help="procesos de trabajo")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("THREADS", 4)),
+                        help="hilos por proceso")
+    parser.add_argument("--max-body", type=int,
+                        default=int(os.environ.get("MAX_CONTENT_LENGTH", 10 * 1024 * 1024)),
+                        help="tamaño máximo del cuerpo de la petición en bytes")
+    parser.add_argument("--timeout", type=int, default=30,
+                        help="segundos antes de reiniciar un proceso bloqueado")
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="segundos para terminar las peticiones en curso al apagar")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit("Se requiere gunicorn para el modo producción: pip install gunicorn")
+
+    # Cada proceso tiene sus propios contadores: se comparten por archivos en METRICS_DIR
+    # para que /metrics y /cache/stats sumen todos los procesos
+    metrics_dir = os.environ.get('METRICS_DIR')
+    temporary_metrics = metrics_dir is None and args.workers > 1
+    if temporary_metrics:
+        metrics_dir = os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='api-metrics-')
+    if metrics_dir:
+        from metrics import clear_snapshots
+        clear_snapshots(metrics_dir)
+
+    # Con varios procesos /admin/reload llega a uno solo y se propaga por los vigilantes
+    # de archivo, así que se activan siempre (cada MODEL_WATCH_INTERVAL segundos)
+    os.environ['API_WORKERS'] = str(args.workers)
+    # El vigilante no se inicia en el import (proceso maestro) sino en post_fork
+    os.environ['API_PREFORK'] = '1'
+    if args.workers > 1:
+        os.environ.setdefault('MODEL_WATCH_INTERVAL', str(DEFAULT_WATCH_INTERVAL))
+
+    # El modelo se carga aquí, en el proceso maestro, antes del fork: los
+    # procesos de trabajo lo heredan sin volver a leerlo. wait_ready() vuelve cuando el
+    # hilo de carga ya soltó los locks del registro, y no queda otro hilo que los tome
+    import api
+    api.app.config['MAX_CONTENT_LENGTH'] = args.max_body
+    # Se espera la carga en segundo plano para que todos los procesos nazcan con el modelo
+    if not api.registry.wait_ready():
+        raise SystemExit(f"No se pudo cargar el modelo: {api.registry.load_error}")
+
+    def post_fork(server, worker):
+        # Los hilos no sobreviven al fork: cada proceso inicia su propio vigilante
+        if os.environ.get('MODEL_WATCH_INTERVAL'):
+            api.registry.start_watching(float(os.environ['MODEL_WATCH_INTERVAL']))
+        if api.shared_metrics:
+            api.shared_metrics.start_writing(float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0)))
+
+    def on_exit(server):
+        if temporary_metrics:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+    class ProductionServer(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'post_fork': post_fork,
+        'on_exit': on_exit,
+        # Límites de la línea y cabeceras de la petición
+        'limit_request_line': 8190,
+        'limit_request_fields': 100,
+    }
+
+    print(f"Sirviendo en {args.bind} con {args.workers} procesos × {args.threads} hilos")
+    if not os.environ.get('ADMIN_TOKEN'):
+        print("ADMIN_TOKEN no definido: POST /admin/reload responderá 403")
+    ProductionServer(api.app, options).run()
+
+if __name__ == '__main__':
+    main()
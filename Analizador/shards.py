@@ -0,0 +1,109 @@
+import os
+import numpy as np
+from compiled_model import model_from_counts
+from naive_bayes import NaiveBayesClassifier
+
+SHARD_FORMAT = 'shard-v1'
+
+class CountShard:
+    """Conteos crudos de Naïve Bayes de una parte del corpus: documentos por clase y
+    matriz clase×palabra sobre un vocabulario ordenado. Los conteos son aditivos, así
+    que varios shards se combinan con merge() sin volver a leer el texto"""
+
+    def __init__(self, categories, vocabulary, word_counts, doc_counts):
+        self.categories = list(categories)
+        self.vocabulary = np.asarray(vocabulary, dtype=str)
+        self.word_counts = np.asarray(word_counts, dtype=np.int64).reshape(
+            len(self.categories), len(self.vocabulary))
+        self.doc_counts = np.asarray(doc_counts, dtype=np.int64)
+
+        if len(self.doc_counts) != len(self.categories):
+            raise ValueError("Shard corrupto: doc_counts no coincide con las categorías")
+        if len(self.vocabulary) > 1 and not np.all(self.vocabulary[:-1] < self.vocabulary[1:]):
+            raise ValueError("Shard corrupto: el vocabulario debe estar ordenado y sin repetidos")
+
+    @classmethod
+    def from_counters(cls, category_counters, doc_counts):
+        """Construye el shard desde {categoría: Counter(palabra)} y {categoría: documentos}"""
+        categories = list(doc_counts)
+        vocabulary = sorted({word for counter in category_counters.values() for word in counter})
+        word_index = {word: idx for idx, word in enumerate(vocabulary)}
+
+        word_counts = np.zeros((len(categories), len(vocabulary)), dtype=np.int64)
+        for row, category in enumerate(categories):
+            counter = category_counters.get(category, {})
+            word_counts[row, [word_index[word] for word in counter]] = list(counter.values())
+        return cls(categories, vocabulary, word_counts, [doc_counts[cat] for cat in categories])
+
+    @classmethod
+    def from_classifier(cls, classifier):
+        categories = list(classifier.class_doc_counts)
+        vocabulary = sorted(classifier.vocabulary)
+        word_counts = [[classifier.class_word_counts[cat].get(word, 0) for word in vocabulary]
+                       for cat in categories]
+        return cls(categories, vocabulary, word_counts,
+                   [classifier.class_doc_counts[cat] for cat in categories])
+
+    def merge(self, other):
+        """Suma otro shard y devuelve el resultado. Las categorías nuevas se agregan en
+        orden de aparición y el vocabulario es la unión ordenada de ambos"""
+        categories = self.categories + [cat for cat in other.categories
+                                        if cat not in self.categories]
+        vocabulary = np.union1d(self.vocabulary, other.vocabulary)
+
+        word_counts = np.zeros((len(categories), len(vocabulary)), dtype=np.int64)
+        doc_counts = np.zeros(len(categories), dtype=np.int64)
+        for shard in (self, other):
+            rows = [categories.index(cat) for cat in shard.categories]
+            columns = np.searchsorted(vocabulary, shard.vocabulary)
+            word_counts[np.ix_(rows, columns)] += shard.word_counts
+            doc_counts[rows] += shard.doc_counts
+        return CountShard(categories, vocabulary, word_counts, doc_counts)
+
+    def top_words(self, vocab_size):
+        """Shard restringido a las vocab_size palabras más frecuentes (empates por orden alfabético)"""
+        if not vocab_size or vocab_size >= len(self.vocabulary):
+            return self
+        totals = self.word_counts.sum(axis=0)
+        keep = np.sort(np.argsort(-totals, kind='stable')[:vocab_size])
+        return CountShard(self.categories, self.vocabulary[keep],
+                          self.word_counts[:, keep], self.doc_counts)
+
+    def to_model(self, alpha=1.0):
+        """Modelo compilado (mismo suavizado que NaiveBayesClassifier)"""
+        return model_from_counts(self.categories, self.vocabulary.tolist(),
+                                 self.word_counts, self.doc_counts, alpha)
+
+    def to_classifier(self, alpha=1.0):
+        return NaiveBayesClassifier.from_counts(self.categories, self.vocabulary.tolist(),
+                                                self.word_counts, self.doc_counts, alpha)
+
+def merge_shards(shards):
+    """Reduce una lista de shards a uno solo (en orden, para conservar el de las categorías)"""
+    shards = list(shards)
+    if not shards:
+        raise ValueError("No hay shards para combinar")
+    merged = shards[0]
+    for shard in shards[1:]:
+        merged = merged.merge(shard)
+    return merged
+
+def save_shard(path, shard):
+    """Escribe el shard (.npz) de forma atómica: otro proceso o máquina puede estar
+    esperando a que aparezca en el directorio compartido"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f,
+                            format=np.array(SHARD_FORMAT),
+                            categories=np.array(shard.categories, dtype=str),
+                            vocabulary=shard.vocabulary,
+                            word_counts=shard.word_counts,
+                            doc_counts=shard.doc_counts)
+    os.replace(tmp_path, path)
+
+def load_shard(path):
+    with np.load(path, allow_pickle=False) as npz:
+        if 'format' not in npz.files or str(npz['format']) != SHARD_FORMAT:
+            raise ValueError(f"{path} no es un shard de conteos ({SHARD_FORMAT})")
+        return CountShard(npz['categories'].tolist(), npz['vocabulary'],
+                          npz['word_counts'], npz['doc_counts'])
@@ -0,0 +1,151 @@
+import json
+import os
+import numpy as np
+from hashing import HashingVectorizer
+
+PREPROCESSED_DIR = os.path.join("Analizador", "preprocessed")
+
+class SparseDataset:
+    """Dataset documento-término en formato CSR (indptr, indices, data) con sus etiquetas.
+    Con hashing (HashingVectorizer) las columnas son buckets y no hay vocabulario"""
+
+    def __init__(self, vocabulary, indptr, indices, data, labels, hashing=None):
+        self.vocabulary = list(vocabulary)
+        self.hashing = hashing
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.data = np.asarray(data, dtype=np.int32)
+        self.labels = [str(label) for label in labels]
+
+        if len(self.indptr) != len(self.labels) + 1:
+            raise ValueError("Dataset corrupto: indptr no coincide con el número de etiquetas")
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def n_features(self):
+        return self.hashing.n_buckets if self.hashing else len(self.vocabulary)
+
+    def rows(self):
+        """Itera (features, categoría) con solo las palabras de conteo distinto de cero
+        (con hashing, las claves son los números de bucket)"""
+        vocabulary = self.vocabulary
+        for row, category in enumerate(self.labels):
+            start, end = self.indptr[row], self.indptr[row + 1]
+            if self.hashing:
+                features = {int(idx): int(count)
+                            for idx, count in zip(self.indices[start:end], self.data[start:end])}
+            else:
+                features = {vocabulary[idx]: int(count)
+                            for idx, count in zip(self.indices[start:end], self.data[start:end])}
+            yield features, category
+
+def from_features(vocabulary, dataset):
+    """Construye el CSR a partir de [(features {palabra: conteo}, categoría)]"""
+    word_index = {word: idx for idx, word in enumerate(vocabulary)}
+    indptr = [0]
+    indices = []
+    data = []
+    labels = []
+
+    for features, category in dataset:
+        for word, count in features.items():
+            if count > 0 and word in word_index:
+                indices.append(word_index[word])
+                data.append(count)
+        indptr.append(len(indices))
+        labels.append(category)
+
+    return SparseDataset(vocabulary, indptr, indices, data, labels)
+
+def from_dense_rows(vocabulary, rows, labels):
+    """Construye el CSR a partir de filas densas de conteos (formato CSV)"""
+    indptr = [0]
+    indices = []
+    data = []
+
+    for row in rows:
+        for idx, count in enumerate(row):
+            if count:
+                indices.append(idx)
+                data.append(count)
+        indptr.append(len(indices))
+
+    return SparseDataset(vocabulary, indptr, indices, data, labels)
+
+def take_rows(sparse, rows):
+    """Subconjunto de filas del CSR (sin recorrer las filas en Python)"""
+    rows = np.asarray(rows, dtype=np.int64)
+    starts = sparse.indptr[rows]
+    lengths = sparse.indptr[rows + 1] - starts
+    indptr = np.concatenate(([0], np.cumsum(lengths)))
+    # Posición en el CSR original de cada entrada de las filas elegidas
+    positions = np.repeat(starts - indptr[:-1], lengths) + np.arange(indptr[-1])
+    labels = [sparse.labels[row] for row in rows]
+    return SparseDataset(sparse.vocabulary, indptr, sparse.indices[positions],
+                         sparse.data[positions], labels, sparse.hashing)
+
+def concat_datasets(datasets):
+    """Une varios datasets con el mismo vocabulario en uno solo"""
+    first = datasets[0]
+    for other in datasets[1:]:
+        if other.vocabulary != first.vocabulary or other.hashing != first.hashing:
+            raise ValueError("Los datasets no comparten el mismo vocabulario")
+
+    offsets = np.cumsum([0] + [sparse.indptr[-1] for sparse in datasets[:-1]])
+    indptr = np.concatenate([[0]] + [sparse.indptr[1:] + offset
+                                     for sparse, offset in zip(datasets, offsets)])
+    return SparseDataset(first.vocabulary, indptr,
+                         np.concatenate([sparse.indices for sparse in datasets]),
+                         np.concatenate([sparse.data for sparse in datasets]),
+                         [label for sparse in datasets for label in sparse.labels],
+                         first.hashing)
+
+def class_counts(sparse, categories):
+    """Matriz de conteos palabra×clase (n_clases × vocabulario) y documentos por clase"""
+    category_index = {category: idx for idx, category in enumerate(categories)}
+    label_ids = np.array([category_index[label] for label in sparse.labels], dtype=np.int64)
+    n_words = sparse.n_features
+
+    # Clase de cada entrada no nula → celda (clase, palabra) aplanada
+    entry_labels = np.repeat(label_ids, np.diff(sparse.indptr))
+    cells = entry_labels * n_words + sparse.indices
+    word_counts = np.bincount(cells, weights=sparse.data,
+                              minlength=len(categories) * n_words)
+    doc_counts = np.bincount(label_ids, minlength=len(categories))
+    return word_counts.reshape(len(categories), n_words).astype(np.int64), doc_counts
+
+def save_sparse_dataset(path, sparse):
+    extra = {}
+    if sparse.hashing:
+        extra['hashing'] = np.array(json.dumps(sparse.hashing.params()))
+    np.savez_compressed(path,
+                        vocabulary=np.array(sparse.vocabulary, dtype=str),
+                        indptr=sparse.indptr,
+                        indices=sparse.indices,
+                        data=sparse.data,
+                        labels=np.array(sparse.labels, dtype=str),
+                        **extra)
+
+def load_sparse_dataset(path):
+    with np.load(path, allow_pickle=False) as npz:
+        hashing = None
+        if 'hashing' in npz.files:
+            hashing = HashingVectorizer.from_params(json.loads(str(npz['hashing'])))
+        return SparseDataset(npz['vocabulary'].tolist(), npz['indptr'], npz['indices'],
+                             npz['data'], npz['labels'].tolist(), hashing)
+
+def is_hashed_dataset(path):
+    """Indica si el .npz se generó con feature hashing (sin leer los arreglos)"""
+    if not path.endswith('.npz'):
+        return False
+    with np.load(path, allow_pickle=False) as npz:
+        return 'hashing' in npz.files
+
+def dataset_filename(name, directory=PREPROCESSED_DIR):
+    """Prefiere el dataset disperso; usa el CSV si solo existe la exportación densa"""
+    sparse_name = f"{name}.npz"
+    if os.path.exists(os.path.join(directory, sparse_name)):
+        return sparse_name
+    return f"{name}.csv"
@@ -0,0 +1,117 @@
+import codecs
+import json
+import numpy as np
+
+STREAM_CHUNK_SIZE = 64 * 1024
+# Un "palabra" más larga que esto no puede estar en el vocabulario: se procesa
+# aunque no haya llegado el espacio siguiente, para acotar la memoria
+MAX_PENDING_CHARS = 64 * 1024
+# Una sección NDJSON se decodifica completa: su largo se acota aparte del cuerpo
+MAX_LINE_BYTES = 16 * 1024 * 1024
+
+class LineTooLong(ValueError):
+    """Una línea (sección) del cuerpo supera el máximo permitido"""
+
+class StreamAccumulator:
+    """Acumula log-verosimilitudes por clase fragmento a fragmento.
+    Igual que /classify, cada palabra del vocabulario cuenta una sola vez,
+    así que el estado es un arreglo de presencia del tamaño del vocabulario"""
+
+    def __init__(self, model):
+        self.model = model
+        self.seen = np.zeros(model.log_probs.shape[1], dtype=bool)
+        self.scores = np.array(model.log_priors, dtype=np.float64)
+
+    def add_text(self, text):
+        ids = np.unique(np.asarray(self.model.text_ids(text), dtype=np.intp))
+        new_ids = ids[~self.seen[ids]]
+        if len(new_ids):
+            self.seen[new_ids] = True
+            self.scores += self.model.sum_log_probs(new_ids)
+
+    def merge(self, other):
+        """Suma otro acumulador (p. ej. una sección) sin contar palabras repetidas"""
+        new_ids = np.flatnonzero(other.seen & ~self.seen)
+        if len(new_ids):
+            self.seen[new_ids] = True
+            self.scores += self.model.sum_log_probs(new_ids)
+
+    def ranking(self):
+        return self.model.rank(self.scores)
+
+def trailing_word_length(text):
+    """Largo de la palabra incompleta al final del texto (0 si termina en espacio)"""
+    if not text or text[-1].isspace():
+        return 0
+    return len(text.rsplit(None, 1)[-1])
+
+def iter_text(stream, chunk_size=STREAM_CHUNK_SIZE):
+    """Lee el cuerpo por bloques y produce texto que termina en límite de palabra"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    pending = ''
+    while True:
+        block = stream.read(chunk_size)
+        if not block:
+            break
+        text = pending + decoder.decode(block)
+        # La última palabra puede continuar en el siguiente bloque
+        cut = len(text) - trailing_word_length(text)
+        if len(text) - cut > MAX_PENDING_CHARS:
+            cut = len(text)
+        if cut:
+            yield text[:cut]
+        pending = text[cut:]
+
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+def iter_lines(stream, chunk_size=STREAM_CHUNK_SIZE, max_line=MAX_LINE_BYTES):
+    """Lee el cuerpo por bloques y produce líneas completas (bytes).
+    Solo se busca el salto de línea en el bloque nuevo; la línea incompleta se guarda
+    como lista de trozos y se une una sola vez, al llegar su final"""
+    parts = []
+    size = 0
+    number = 1
+    while True:
+        block = stream.read(chunk_size)
+        if not block:
+            break
+        start = 0
+        end = block.find(b'\n')
+        while end >= 0:
+            if size + end - start > max_line:
+                raise LineTooLong(f"Línea {number}: supera el máximo de {max_line} bytes")
+            if parts:
+                parts.append(block[start:end])
+                yield b''.join(parts)
+                parts = []
+                size = 0
+            else:
+                yield block[start:end]
+            number += 1
+            start = end + 1
+            end = block.find(b'\n', start)
+        if start < len(block):
+            size += len(block) - start
+            if size > max_line:
+                raise LineTooLong(f"Línea {number}: supera el máximo de {max_line} bytes")
+            parts.append(block[start:])
+    if parts:
+        yield b''.join(parts)
+
+def iter_sections(stream, chunk_size=STREAM_CHUNK_SIZE, max_line=MAX_LINE_BYTES):
+    """Secciones NDJSON: cada línea es texto o un objeto con "text" (y opcional "id")"""
+    for number, line in enumerate(iter_lines(stream, chunk_size, max_line), 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            raise ValueError(f"Línea {number}: JSON inválido")
+        if isinstance(item, str):
+            item = {'text': item}
+        if not isinstance(item, dict) or not isinstance(item.get('text'), str):
+            raise ValueError(f'Línea {number}: se esperaba texto o un objeto con "text"')
+        yield item
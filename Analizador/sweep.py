@@ -0,0 +1,175 @@
+import argparse
+import csv
+import itertools
+import os
+import random
+import time
+from collections import Counter
+from multiprocessing import Pool
+import numpy as np
+
+from compiled_model import model_from_counts
+from evaluate_model import predict_mapped, confusion_matrix, metrics_from_confusion
+from preprocess_bbc_dataset import (CATEGORIES, NEWS_PATH, SUMMARIES_PATH, TEST_SIZE, SEED,
+                                    VOCAB_SIZE, DOC_CHUNK_SIZE, process_category_files)
+from sparse_dataset import SparseDataset, take_rows, class_counts, PREPROCESSED_DIR
+
+DEFAULT_ALPHAS = [0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0]
+DEFAULT_VOCAB_SIZES = [1000, 2000, VOCAB_SIZE, 10000, 20000]
+DEFAULT_CHUNK_SIZES = [50, DOC_CHUNK_SIZE, 200]
+RESULT_FIELDS = ['chunk_size', 'vocab_size', 'alpha', 'vocab_used',
+                 'accuracy', 'precision', 'recall', 'f1']
+
+def index_tokens(category_data):
+    """Vocabulario completo ordenado por frecuencia (mismo orden que most_common en
+    prepare_ml_datasets) y los tokens de cada categoría convertidos a índices"""
+    frequencies = Counter(word for words in category_data.values() for word in words)
+    vocabulary = [word for word, _ in frequencies.most_common()]
+    word_index = {word: idx for idx, word in enumerate(vocabulary)}
+
+    category_ids = {category: np.fromiter((word_index[word] for word in words),
+                                          dtype=np.int64, count=len(words))
+                    for category, words in category_data.items()}
+    return vocabulary, category_ids
+
+def chunk_dataset(vocabulary, category_ids, chunk_size):
+    """CSR de pseudo-documentos de chunk_size palabras sobre el vocabulario completo"""
+    doc_rows = []
+    labels = []
+    n_docs = 0
+    for category, ids in category_ids.items():
+        doc_rows.append(n_docs + np.arange(len(ids)) // chunk_size)
+        category_docs = -(-len(ids) // chunk_size)
+        labels.extend([category] * category_docs)
+        n_docs += category_docs
+
+    # Conteo (documento, palabra) con un solo np.unique sobre la celda aplanada
+    n_words = len(vocabulary)
+    cells = np.concatenate(doc_rows) * n_words + np.concatenate(list(category_ids.values()))
+    cells, counts = np.unique(cells, return_counts=True)
+    rows = cells // n_words
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=n_docs))))
+    return SparseDataset(vocabulary, indptr, cells % n_words, counts, labels)
+
+def split_dataset(sparse, seed=SEED):
+    """División train/test con la misma permutación que prepare_ml_datasets"""
+    order = list(range(len(sparse)))
+    random.Random(seed).shuffle(order)
+    split_idx = int(len(order) * (1 - TEST_SIZE))
+    return take_rows(sparse, order[:split_idx]), take_rows(sparse, order[split_idx:])
+
+def build_sweep_state(category_data, chunk_sizes, seed=SEED):
+    """Matrices de conteo clase×palabra de entrenamiento y CSR de prueba por tamaño de chunk.
+    Todas las combinaciones de alpha y vocabulario se derivan de estas matrices"""
+    vocabulary, category_ids = index_tokens(category_data)
+    categories = list(category_data)
+
+    chunks = {}
+    for chunk_size in chunk_sizes:
+        train, test = split_dataset(chunk_dataset(vocabulary, category_ids, chunk_size), seed)
+        word_counts, doc_counts = class_counts(train, categories)
+        chunks[chunk_size] = {'word_counts': word_counts, 'doc_counts': doc_counts, 'test': test}
+
+    return {'categories': categories, 'vocabulary': vocabulary, 'chunks': chunks}
+
+# Estado compartido con los procesos del barrido (heredado al hacer fork)
+_sweep_state = {}
+
+def _init_sweep(state):
+    _sweep_state.update(state)
+
+def evaluate_config(config):
+    """Entrena y evalúa una combinación (chunk_size, vocab_size, alpha) desde los conteos"""
+    chunk_size, vocab_size, alpha = config
+    categories = _sweep_state['categories']
+    chunk = _sweep_state['chunks'][chunk_size]
+
+    # El vocabulario está ordenado por frecuencia: el corte es un prefijo de columnas
+    vocabulary = _sweep_state['vocabulary'][:vocab_size]
+    word_counts = chunk['word_counts'][:, :vocab_size]
+    model = model_from_counts(categories, vocabulary, word_counts, chunk['doc_counts'], alpha)
+
+    # Columna del modelo para cada palabra del vocabulario completo, sin pasar por el
+    # diccionario: el modelo conserva, en orden, las palabras del prefijo con algún conteo
+    seen = word_counts.sum(axis=0) > 0
+    columns = np.full(len(_sweep_state['vocabulary']), -1, dtype=np.intp)
+    columns[:len(seen)][seen] = np.arange(len(model.vocabulary))
+
+    test = chunk['test']
+    pred_labels = [categories[idx] for idx in predict_mapped(test, columns, model)]
+    metrics = metrics_from_confusion(confusion_matrix(test.labels, pred_labels, categories))
+
+    return {'chunk_size': chunk_size, 'vocab_size': vocab_size, 'alpha': alpha,
+            'vocab_used': len(model.vocabulary),
+            **{name: round(float(metrics[name]), 6)
+               for name in ('accuracy', 'precision', 'recall', 'f1')}}
+
+def run_sweep(state, configs, workers=1):
+    """Evalúa todas las combinaciones, en paralelo si workers > 1"""
+    if workers > 1:
+        with Pool(workers, initializer=_init_sweep, initargs=(state,)) as pool:
+            return list(pool.imap_unordered(evaluate_config, configs, chunksize=8))
+    _init_sweep(state)
+    return [evaluate_config(config) for config in configs]
+
+def save_results(path, results):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+def print_results(results, top):
+    print(f"\n----------------MEJORES {min(top, len(results))} CONFIGURACIONES----------------")
+    print(f"{'Chunk':<7} {'Vocab':<8} {'Alpha':<7} {'Exactitud':<10} {'Precisión':<10} "
+          f"{'Recall':<10} {'F1-Score':<10}")
+    for row in results[:top]:
+        print(f"{row['chunk_size']:<7} {row['vocab_size']:<8} {row['alpha']:<7g} "
+              f"{row['accuracy']:<10.2%} {row['precision']:<10.2%} {row['recall']:<10.2%} "
+              f"{row['f1']:<10.2%}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Barrido de hiperparámetros (alpha, vocabulario, tamaño de chunk)")
+    parser.add_argument("--alphas", type=float, nargs="+", default=DEFAULT_ALPHAS)
+    parser.add_argument("--vocab-sizes", type=int, nargs="+", default=DEFAULT_VOCAB_SIZES)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=DEFAULT_CHUNK_SIZES)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="procesos para evaluar las combinaciones")
+    parser.add_argument("--ingest-workers", type=int, default=1,
+                        help="procesos para leer y tokenizar el dataset")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--top", type=int, default=15, help="filas a mostrar")
+    parser.add_argument("--output", default=os.path.join(PREPROCESSED_DIR, "sweep_results.csv"))
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    print("----------------BARRIDO DE HIPERPARÁMETROS----------------")
+
+    start = time.perf_counter()
+    print("Leyendo y tokenizando el dataset (una sola vez)...")
+    news_data = process_category_files(NEWS_PATH, CATEGORIES, args.ingest_workers)
+    summaries_data = process_category_files(SUMMARIES_PATH, CATEGORIES, args.ingest_workers)
+    combined_data = {category: news_data[category] + summaries_data[category]
+                     for category in CATEGORIES}
+
+    print("Construyendo matrices de conteo por tamaño de chunk...")
+    state = build_sweep_state(combined_data, args.chunk_sizes, args.seed)
+    prepared = time.perf_counter()
+
+    configs = list(itertools.product(args.chunk_sizes, args.vocab_sizes, args.alphas))
+    print(f"Evaluando {len(configs)} configuraciones con {args.workers} procesos...")
+    results = run_sweep(state, configs, args.workers)
+    finished = time.perf_counter()
+
+    results.sort(key=lambda row: (-row['f1'], row['chunk_size'], row['vocab_size'], row['alpha']))
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    save_results(args.output, results)
+    print_results(results, args.top)
+
+    print(f"\nPreparación: {prepared - start:.1f} s   Barrido: {finished - prepared:.1f} s "
+          f"({len(configs) / (finished - prepared):.0f} configuraciones/s)")
+    print(f"Resultados guardados en: {args.output}")
+
+if __name__ == '__main__':
+    main()
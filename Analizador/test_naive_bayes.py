@@ -0,0 +1,48 @@
+import unittest
+from naive_bayes import NaiveBayesClassifier
+from shards import CountShard
+
+PRIMERA_PARTE = [
+    ({'gol': 3, 'partido': 2, 'equipo': 1}, 'sport'),
+    ({'banco': 2, 'mercado': 4}, 'business'),
+    ({'elecciones': 2, 'gobierno': 3, 'mercado': 1}, 'politics'),
+]
+SEGUNDA_PARTE = [
+    ({'partido': 1, 'gobierno': 2, 'ministro': 1}, 'politics'),
+    ({'gol': 1, 'liga': 2}, 'sport'),
+    ({'pelicula': 3, 'estreno': 1}, 'entertainment'),
+]
+
+def entrenar(documentos, alpha=1.0):
+    classifier = NaiveBayesClassifier(alpha)
+    classifier.train(documentos)
+    return classifier
+
+class MergeTest(unittest.TestCase):
+    def assert_mismo_modelo(self, a, b):
+        self.assertEqual(a.class_doc_counts, b.class_doc_counts)
+        self.assertEqual(a.class_total_words, b.class_total_words)
+        self.assertEqual(a.vocabulary, b.vocabulary)
+        self.assertEqual({cat: dict(counts) for cat, counts in a.class_word_counts.items()},
+                         {cat: dict(counts) for cat, counts in b.class_word_counts.items()})
+        self.assertEqual(a.class_probs.keys(), b.class_probs.keys())
+        for category in a.class_probs:
+            self.assertAlmostEqual(a.class_probs[category], b.class_probs[category])
+            for word, prob in a.word_probs[category].items():
+                self.assertAlmostEqual(prob, b.word_probs[category][word])
+
+    def test_merge_igual_a_entrenar_con_ambos_conjuntos(self):
+        fusionado = entrenar(PRIMERA_PARTE).merge(entrenar(SEGUNDA_PARTE))
+        self.assert_mismo_modelo(fusionado, entrenar(PRIMERA_PARTE + SEGUNDA_PARTE))
+
+    def test_merge_con_clasificador_vacio(self):
+        classifier = entrenar(PRIMERA_PARTE)
+        self.assert_mismo_modelo(classifier.merge(NaiveBayesClassifier()), entrenar(PRIMERA_PARTE))
+
+    def test_merge_de_shards_igual_a_merge_de_clasificadores(self):
+        shard = CountShard.from_classifier(entrenar(PRIMERA_PARTE)).merge(
+            CountShard.from_classifier(entrenar(SEGUNDA_PARTE)))
+        self.assert_mismo_modelo(shard.to_classifier(), entrenar(PRIMERA_PARTE + SEGUNDA_PARTE))
+
+if __name__ == '__main__':
+    unittest.main()
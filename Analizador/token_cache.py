@@ -0,0 +1,131 @@
+import os
+import pickle
+from multiprocessing import Pool
+import tokenizer
+from fingerprints import file_digest
+
+CACHE_FORMAT = 'token-cache-v1'
+CACHE_PATH = os.path.join("Analizador", "preprocessed", "token_cache.pkl")
+CHUNK_SIZE = 64  # Archivos por bloque enviado a cada proceso
+
+def tokenizer_fingerprint():
+    """Huella del código del tokenizador: si cambian la limpieza o las stopwords,
+    los tokens guardados ya no sirven"""
+    return file_digest(tokenizer.__file__)
+
+def tokenize_file(path):
+    """Tokens del archivo unidos por espacios (los tokens solo tienen letras a-z);
+    None si no se pudo leer"""
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as file:
+            content = file.read().strip()
+    except Exception as e:
+        print(f"Error procesando {path}: {str(e)}")
+        return None
+    return " ".join(tokenizer.tokenize(content)) if content else ""
+
+class TokenCache:
+    """Caché persistente de tokens por archivo, direccionado por contenido.
+    Cada ruta guarda (mtime, tamaño, sha256) para no releer archivos sin cambios, y
+    los tokens se guardan por sha256: un archivo movido o copiado no se retokeniza"""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.files = {}   # ruta -> (mtime_ns, tamaño, sha256)
+        self.tokens = {}  # sha256 -> tokens unidos por espacios
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+        except Exception as e:
+            print(f"Caché de tokens ilegible, se reconstruye: {str(e)}")
+            return
+        if data.get('format') == CACHE_FORMAT and data.get('tokenizer') == tokenizer_fingerprint():
+            self.files = data['files']
+            self.tokens = data['tokens']
+
+    def refresh(self, paths, workers=1):
+        """Deja en el caché los tokens de paths y olvida el resto. Los archivos que no se
+        pueden leer se informan y se omiten (sus tokens quedan vacíos).
+        Devuelve (archivos reutilizados del caché, archivos tokenizados)"""
+        missing = {}
+        reused = 0
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                entry = self.files.get(path)
+                if entry and entry[:2] == (stat.st_mtime_ns, stat.st_size) and entry[2] in self.tokens:
+                    reused += 1
+                    continue
+                digest = file_digest(path)
+            except Exception as e:
+                print(f"Error procesando {path}: {str(e)}")
+                if self.files.pop(path, None):
+                    self.dirty = True
+                continue
+            self.files[path] = (stat.st_mtime_ns, stat.st_size, digest)
+            self.dirty = True
+            if digest in self.tokens:
+                reused += 1
+            else:
+                missing.setdefault(digest, []).append(path)
+
+        sources = [group[0] for group in missing.values()]
+        if workers > 1 and len(sources) > 1:
+            with Pool(processes=workers) as pool:
+                # imap: los tokens se guardan a medida que llegan
+                texts = pool.imap(tokenize_file, sources, chunksize=CHUNK_SIZE)
+                tokenized = self._store(zip(missing.items(), texts))
+        else:
+            tokenized = self._store((item, tokenize_file(item[1][0])) for item in missing.items())
+
+        # Rutas que ya no existen y contenidos sin ninguna ruta
+        current = set(paths)
+        for path in [path for path in self.files if path not in current]:
+            del self.files[path]
+            self.dirty = True
+        referenced = {entry[2] for entry in self.files.values()}
+        for digest in [digest for digest in self.tokens if digest not in referenced]:
+            del self.tokens[digest]
+            self.dirty = True
+        return reused, tokenized
+
+    def _store(self, results):
+        """Guarda los tokens de cada contenido nuevo; devuelve cuántos archivos cubren"""
+        tokenized = 0
+        for (digest, group), text in results:
+            if text is None:
+                # Ilegible: se reintenta en la próxima corrida
+                for path in group:
+                    del self.files[path]
+                continue
+            self.tokens[digest] = text
+            tokenized += len(group)
+        return tokenized
+
+    def digest(self, path):
+        """sha256 del archivo; None si no se pudo leer"""
+        entry = self.files.get(path)
+        return entry[2] if entry else None
+
+    def tokens_for(self, path):
+        entry = self.files.get(path)
+        return self.tokens[entry[2]].split() if entry else []
+
+    def save(self):
+        """Escritura atómica, solo si hubo cambios"""
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'format': CACHE_FORMAT, 'tokenizer': tokenizer_fingerprint(),
+                         'files': self.files, 'tokens': self.tokens}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
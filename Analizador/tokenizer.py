@@ -0,0 +1,79 @@
+import re
+import numpy as np
+
+# Lista de stopwords (única para preprocesamiento, entrenamiento y API)
+STOPWORDS = {
+    "a", "about", "above", "after", "again", "against", "all", "am", "an", "and",
+    "any", "are", "aren't", "as", "at", "be", "because", "been", "before",
+    "being", "below", "between", "both", "but", "by", "can't", "cannot",
+    "could", "couldn't", "did", "didn't", "do", "does", "doesn't", "doing",
+    "don't", "down", "during", "each", "few", "for", "from", "further",
+    "had", "hadn't", "has", "hasn't", "have", "haven't", "having", "he",
+    "he'd", "he'll", "he's", "her", "here", "here's", "hers", "herself",
+    "him", "himself", "his", "how", "how's", "i", "i'd", "i'll", "i'm",
+    "i've", "if", "in", "into", "is", "isn't", "it", "it's", "its",
+    "itself", "let's", "me", "more", "most", "mustn't", "my", "myself",
+    "no", "nor", "not", "of", "off", "on", "once", "only", "or", "other",
+    "ought", "our", "ours", "ourselves", "out", "over", "own", "same",
+    "shan't", "she", "she'd", "she'll", "she's", "should", "shouldn't",
+    "so", "some", "such", "than", "that", "that's", "the", "their",
+    "theirs", "them", "themselves", "then", "there", "there's", "these",
+    "they", "they'd", "they'll", "they're", "they've", "this", "those",
+    "through", "to", "too", "under", "until", "up", "very", "was", "wasn't",
+    "we", "we'd", "we'll", "we're", "we've", "were", "weren't", "what",
+    "what's", "when", "when's", "where", "where's", "which", "while", "who",
+    "who's", "whom", "why", "why's", "with", "won't", "would", "wouldn't",
+    "you", "you'd", "you'll", "you're", "you've", "your", "yours",
+    "yourself", "yourselves"
+}
+
+MIN_WORD_LEN = 3
+
+# Bytes que sobreviven la limpieza: a-z y espacios ASCII (los mismos que \s)
+_KEEP_BYTES = set(range(ord('a'), ord('z') + 1)) | {b for b in range(128) if chr(b).isspace()}
+_DELETE_BYTES = bytes(b for b in range(256) if b not in _KEEP_BYTES)
+# Espacios no ASCII en UTF-8 (NBSP, U+3000, ...): separan palabras igual que en split().
+# Los de la familia U+2000 comparten prefijo con comillas y guiones tipográficos,
+# así que se buscan con una sola expresión regular
+_UNICODE_SPACES = [b'\xc2\x85', b'\xc2\xa0', b'\xe1\x9a\x80', b'\xe3\x80\x80']
+_GENERAL_SPACES = re.compile(rb'\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f')
+
+def clean_text(text):
+    """Equivale a re.sub(r'[^a-z\\s]', '', text.lower()), pero elimina los
+    caracteres con una sola pasada de bytes.translate sobre el texto codificado"""
+    data = text.lower().encode('utf-8', 'surrogatepass')
+    if not data.isascii():
+        for space in _UNICODE_SPACES:
+            if space in data:
+                data = data.replace(space, b' ')
+        if b'\xe2' in data:
+            data = _GENERAL_SPACES.sub(b' ', data)
+    return data.translate(None, _DELETE_BYTES).decode('ascii')
+
+def tokenize(text, stopwords=STOPWORDS):
+    """Minúsculas, sin puntuación, sin stopwords ni palabras de menos de 3 letras"""
+    return tokenize_and_count(text, stopwords)[0]
+
+def tokenize_and_count(text, stopwords=STOPWORDS):
+    """Como tokenize, pero devuelve también el número de palabras del texto
+    limpio (incluye stopwords), útil para medir la tasa de palabras sin vocabulario"""
+    words = clean_text(text).split()
+    tokens = [word for word in words if len(word) >= MIN_WORD_LEN and word not in stopwords]
+    return tokens, len(words)
+
+def token_ids(text, word_index):
+    """Tokeniza y convierte directamente a índices del vocabulario (descarta OOV).
+    El vocabulario se construye con tokenize(), así que no contiene stopwords ni
+    palabras cortas y no hace falta filtrarlas aquí"""
+    return [idx for idx in map(word_index.get, clean_text(text).split()) if idx is not None]
+
+def token_ids_and_count(text, word_index):
+    """Como token_ids, pero devuelve también el número de palabras del texto
+    limpio (incluye stopwords), útil para medir la tasa de palabras sin vocabulario"""
+    words = clean_text(text).split()
+    return [idx for idx in map(word_index.get, words) if idx is not None], len(words)
+
+def count_ids(text, word_index):
+    """Arreglos (ids, conteos) de las palabras del vocabulario presentes en el texto"""
+    ids = np.asarray(token_ids(text, word_index), dtype=np.intp)
+    return np.unique(ids, return_counts=True)
@@ -1,67 +1,44 @@
 from collections import defaultdict
 from naive_bayes import NaiveBayesClassifier
+from compiled_model import compile_model, load_model, export_mmap, hashed_model_from_counts
+from fingerprints import file_digest, fingerprint, fresh_stamp, stamp_path, write_stamp
+from sparse_dataset import (load_sparse_dataset, dataset_filename, class_counts,
+                            is_hashed_dataset, PREPROCESSED_DIR)
 import csv
 import os
+import argparse
 import pickle
 import numpy as np
+from out_of_core import train_out_of_core, iter_raw_sources, iter_jsonl_sources
+from preprocess_bbc_dataset import VOCAB_SIZE, DOC_CHUNK_SIZE, SEED
 
-STOPWORDS = {
-    "a", "about", "above", "after", "again", "against", "all", "am", "an", "and",
-    "any", "are", "aren't", "as", "at", "be", "because", "been", "before",
-    "being", "below", "between", "both", "but", "by", "can't", "cannot",
-    "could", "couldn't", "did", "didn't", "do", "does", "doesn't", "doing",
-    "don't", "down", "during", "each", "few", "for", "from", "further",
-    "had", "hadn't", "has", "hasn't", "have", "haven't", "having", "he",
-    "he'd", "he'll", "he's", "her", "here", "here's", "hers", "herself",
-    "him", "himself", "his", "how", "how's", "i", "i'd", "i'll", "i'm",
-    "i've", "if", "in", "into", "is", "isn't", "it", "it's", "its",
-    "itself", "let's", "me", "more", "most", "mustn't", "my", "myself",
-    "no", "nor", "not", "of", "off", "on", "once", "only", "or", "other",
-    "ought", "our", "ours", "ourselves", "out", "over", "own", "same",
-    "shan't", "she", "she'd", "she'll", "she's", "should", "shouldn't",
-    "so", "some", "such", "than", "that", "that's", "the", "their",
-    "theirs", "them", "themselves", "then", "there", "there's", "these",
-    "they", "they'd", "they'll", "they're", "they've", "this", "those",
-    "through", "to", "too", "under", "until", "up", "very", "was", "wasn't",
-    "we", "we'd", "we'll", "we're", "we've", "were", "weren't", "what",
-    "what's", "when", "when's", "where", "where's", "which", "while", "who",
-    "who's", "whom", "why", "why's", "with", "won't", "would", "wouldn't",
-    "you", "you'd", "you'll", "you're", "you've", "your", "yours",
-    "yourself", "yourselves"
-}
-
-def load_dataset(filename):
-    """Carga mejorada con verificación de datos"""
-    filepath = os.path.join("Analizador", "preprocessed", filename)
+CATEGORIES = ["business", "entertainment", "politics", "sport", "tech"]
+
+def load_dataset(filename, directory=PREPROCESSED_DIR):
+    """Carga mejorada con verificación de datos (formato disperso .npz o CSV)"""
+    filepath = os.path.join(directory, filename)
     
     dataset = []
     vocabulary = set()
     category_counts = defaultdict(int)
     
-    with open(filepath, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        vocab_list = next(reader)[:-1]  # Excluye categoría
-        
-        for row_num, row in enumerate(reader, 1):
-            try:
-                features = {word: int(count) for word, count in zip(vocab_list, row[:-1])}
-                category = row[-1]
-                
-                # Verificar que la categoría es válida
-                if category not in ["business", "entertainment", "politics", "sport", "tech"]:
-                    raise ValueError(f"Categoría inválida en fila {row_num}: {category}")
-                
-                dataset.append((features, category))
-                category_counts[category] += 1
-                
-                # Construir vocabulario
-                for word, count in features.items():
-                    if count > 0:
-                        vocabulary.add(word)
-                        
-            except Exception as e:
-                print(f"Error en fila {row_num}: {str(e)}")
-                continue
+    for row_num, (features, category) in enumerate(read_rows(filepath), 1):
+        try:
+            # Verificar que la categoría es válida
+            if category not in CATEGORIES:
+                raise ValueError(f"Categoría inválida en fila {row_num}: {category}")
+            
+            dataset.append((features, category))
+            category_counts[category] += 1
+            
+            # Construir vocabulario
+            for word, count in features.items():
+                if count > 0:
+                    vocabulary.add(word)
+                    
+        except Exception as e:
+            print(f"Error en fila {row_num}: {str(e)}")
+            continue
     
     print("\nDistribución de categorías en los datos:")
     for cat, count in category_counts.items():
@@ -69,39 +46,203 @@ def load_dataset(filename):
     
     return dataset, vocabulary
 
+def read_rows(filepath):
+    """Itera (features, categoría) desde el .npz disperso o el CSV denso"""
+    if filepath.endswith('.npz'):
+        yield from load_sparse_dataset(filepath).rows()
+        return
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        vocab_list = next(reader)[:-1]  # Excluye categoría
+        
+        for row in reader:
+            features = {word: int(count) for word, count in zip(vocab_list, row[:-1])
+                        if count != '0'}
+            yield features, row[-1]
+
 def save_model(classifier, filename):
-    """Guarda el modelo con verificación"""
-    model_data = {
-        'class_probs': classifier.class_probs,
-        'word_probs': classifier.word_probs,
-        'vocabulary': list(classifier.vocabulary),
-        'stopwords': STOPWORDS
-    }
+    """Guarda el modelo compilado (índice de vocabulario + matriz de log-probabilidades)"""
+    # Verificar estructura antes de compilar
+    if not classifier.class_probs:
+        raise ValueError("Modelo incompleto: falta class_probs")
+    if not classifier.word_probs:
+        raise ValueError("Modelo incompleto: falta word_probs")
+    if not classifier.vocabulary:
+        raise ValueError("Modelo incompleto: falta vocabulary")
+
+    categories = list(classifier.class_probs)
+    vocabulary = sorted(classifier.vocabulary)
+    
+    # Conteos crudos para poder continuar el entrenamiento con partial_fit
+    word_counts = [[classifier.class_word_counts[cat].get(word, 0) for word in vocabulary]
+                   for cat in categories]
+    doc_counts = [classifier.class_doc_counts[cat] for cat in categories]
+    
+    model = compile_model(classifier.class_probs, classifier.word_probs, vocabulary,
+                          word_counts, doc_counts)
+    write_model(model, filename)
+
+def write_model(model, filename):
+    # Escritura atómica: la API puede recargar el archivo en caliente
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'wb') as f:
+        pickle.dump(model.to_dict(), f)
+    os.replace(tmp_filename, filename)
+
+def load_classifier(filename, alpha=1.0):
+    """Reconstruye el clasificador desde los conteos guardados en un modelo existente"""
+    model = load_model(filename)
+    if not model.has_counts():
+        raise ValueError("El modelo no incluye conteos crudos; reentrena desde cero")
+    return NaiveBayesClassifier.from_counts(model.categories, model.vocabulary,
+                                            model.word_counts, model.doc_counts, alpha)
+
+def train_hashed(sparse, alpha=1.0, base_model=None):
+    """Entrena el modelo de hashing directamente desde la matriz CSR de buckets.
+    Con base_model (--incremental) suma sus conteos a los del dataset nuevo"""
+    invalid = set(sparse.labels) - set(CATEGORIES)
+    if invalid:
+        raise ValueError(f"Categorías inválidas: {sorted(invalid)}")
+    categories = list(base_model.categories) if base_model else sorted(set(sparse.labels))
+    if set(sparse.labels) - set(categories):
+        raise ValueError("El dataset tiene categorías que el modelo existente no conoce")
+
+    word_counts, doc_counts = class_counts(sparse, categories)
+    if base_model:
+        if getattr(base_model, 'vectorizer', None) != sparse.hashing:
+            raise ValueError("El modelo existente no usa los mismos parámetros de hashing")
+        if not base_model.has_counts():
+            raise ValueError("El modelo no incluye conteos crudos; reentrena desde cero")
+        word_counts = word_counts + base_model.word_counts
+        doc_counts = doc_counts + base_model.doc_counts
+
+    return hashed_model_from_counts(categories, sparse.hashing, word_counts, doc_counts, alpha)
+
+def mmap_path_for(model_path):
+    """Directorio mmap que acompaña al pickle (bbc_classifier.pkl → bbc_classifier.mmap/)"""
+    return os.path.splitext(model_path)[0] + '.mmap'
+
+def write_mmap(model, model_path):
+    """Exporta el modelo para carga con mmap junto al pickle"""
+    mmap_path = mmap_path_for(model_path)
+    export_mmap(model, mmap_path)
+    print(f"Modelo para mmap guardado en: {mmap_path}")
+
+def train_raw_main(args, model_path):
+    """Entrenamiento fuera de memoria: dos pasadas de streaming sobre el texto crudo"""
+    if args.jsonl:
+        print(f"\nEntrenando desde {args.jsonl} (streaming, dos pasadas)...")
+        make_sources = lambda: iter_jsonl_sources(args.jsonl)
+    else:
+        print("\nEntrenando desde DataSet/ (streaming, dos pasadas)...")
+        make_sources = lambda: iter_raw_sources(workers=args.workers)
+    
+    model = train_out_of_core(make_sources, vocab_size=args.vocab_size,
+                              chunk_size=args.chunk_size, seed=args.seed, alpha=args.alpha)
+    print(f"{len(model.categories)} categorías, {len(model.vocabulary)} palabras, "
+          f"{int(model.doc_counts.sum())} documentos de entrenamiento")
+    
+    write_model(model, model_path)
+    print(f"\nModelo guardado en: {model_path}")
+    
+    if args.mmap:
+        write_mmap(model, model_path)
+    print("\nProceso completado exitosamente!")
+
+def train_hashed_main(args, data_path, model_path):
+    print("\nCargando dataset de entrenamiento (feature hashing)...")
+    sparse = load_sparse_dataset(data_path)
+    if len(sparse) == 0:
+        raise ValueError("No hay datos de entrenamiento válidos")
+    
+    base_model = load_model(model_path) if args.incremental else None
+    print("\nActualizando modelo existente..." if base_model else "\nEntrenando modelo Naïve Bayes...")
+    model = train_hashed(sparse, args.alpha, base_model)
+    print(f"{len(model.categories)} categorías, {sparse.hashing.n_buckets} buckets")
     
-    # Verificar estructura antes de guardar
-    required_keys = ['class_probs', 'word_probs', 'vocabulary']
-    for key in required_keys:
-        if not model_data.get(key):
-            raise ValueError(f"Modelo incompleto: falta {key}")
+    write_model(model, model_path)
+    print(f"\nModelo guardado en: {model_path}")
     
-    with open(filename, 'wb') as f:
-        pickle.dump(model_data, f)
+    if args.mmap:
+        write_mmap(model, model_path)
+    print("\nProceso completado exitosamente!")
+
+def write_training_stamp(args, model_path, inputs):
+    """Sella el modelo con la huella del dataset y las opciones. Con --incremental no:
+    el resultado depende también del modelo anterior"""
+    if args.incremental:
+        return
+    outputs = [model_path]
+    if args.mmap:
+        outputs.append(mmap_path_for(model_path))
+    write_stamp(stamp_path(model_path), inputs, outputs)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Entrena el clasificador Naïve Bayes")
+    parser.add_argument("--data", default="train_dataset",
+                        help="dataset en Analizador/preprocessed (sin extensión)")
+    parser.add_argument("--raw", action="store_true",
+                        help="entrena directamente desde las carpetas de DataSet sin preprocesar")
+    parser.add_argument("--jsonl", metavar="ARCHIVO",
+                        help='entrena directamente desde un JSONL con {"text", "category"} por línea')
+    parser.add_argument("--vocab-size", type=int, default=VOCAB_SIZE,
+                        help="con --raw/--jsonl, tamaño del vocabulario")
+    parser.add_argument("--chunk-size", type=int, default=DOC_CHUNK_SIZE,
+                        help="con --raw/--jsonl, palabras por pseudo-documento")
+    parser.add_argument("--seed", type=int, default=SEED,
+                        help="con --raw/--jsonl, semilla de la división train/test")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="con --raw, procesos para leer y tokenizar archivos")
+    parser.add_argument("--incremental", action="store_true",
+                        help="actualiza el modelo existente con --data en lugar de reentrenar")
+    parser.add_argument("--alpha", type=float, default=1.0,
+                        help="suavizado aditivo de P(w|c) (1 = Laplace)")
+    parser.add_argument("--mmap", action="store_true",
+                        help="exporta también el modelo para carga con mmap (bbc_classifier.mmap/)")
+    parser.add_argument("--force", action="store_true",
+                        help="reentrena aunque el dataset y las opciones no hayan cambiado")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
     print("----------------ENTRENAMIENTO DEL MODELO----------------")
     
     try:
+        model_path = os.path.join("Analizador", "bbc_classifier.pkl")
+        
+        if args.raw or args.jsonl:
+            train_raw_main(args, model_path)
+            return
+        
+        data_path = os.path.join(PREPROCESSED_DIR, dataset_filename(args.data))
+        inputs = fingerprint('train', file_digest(data_path), args.alpha, args.mmap)
+        if not (args.incremental or args.force) and fresh_stamp(stamp_path(model_path), inputs):
+            print(f"\nEl modelo {model_path} ya está entrenado con este dataset y estas opciones")
+            print("(usa --force para reentrenar)")
+            return
+        
+        if is_hashed_dataset(data_path):
+            train_hashed_main(args, data_path, model_path)
+            write_training_stamp(args, model_path, inputs)
+            return
+        
         # 1. Cargar datos con verificación
         print("\nCargando dataset de entrenamiento...")
-        train_data, vocabulary = load_dataset('train_dataset.csv')
+        train_data, vocabulary = load_dataset(dataset_filename(args.data))
         
         if not train_data:
             raise ValueError("No hay datos de entrenamiento válidos")
         
         # 2. Entrenar modelo con validación
-        print("\nEntrenando modelo Naïve Bayes...")
-        classifier = NaiveBayesClassifier()
-        classifier.train(train_data)
+        if args.incremental:
+            print("\nActualizando modelo Naïve Bayes existente...")
+            classifier = load_classifier(model_path, args.alpha)
+            classifier.partial_fit(train_data)
+        else:
+            print("\nEntrenando modelo Naïve Bayes...")
+            classifier = NaiveBayesClassifier(args.alpha)
+            classifier.train(train_data)
         
         # Validación rápida del modelo
         test_sample = {word: 1 for word in list(vocabulary)[:10]}
@@ -109,10 +250,13 @@ def main():
         print(f"Predicción para muestra: {classifier.predict(test_sample)}")
         
         # 3. Guardar modelo
-        model_path = os.path.join("Analizador", "bbc_classifier.pkl")
         save_model(classifier, model_path)
         
         print(f"\nModelo guardado en: {model_path}")
+        
+        if args.mmap:
+            write_mmap(load_model(model_path), model_path)
+        write_training_stamp(args, model_path, inputs)
         print("\nProceso completado exitosamente!")
         
     except Exception as e:
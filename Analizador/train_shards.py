@@ -0,0 +1,265 @@
+import argparse
+import glob
+import json
+import os
+import time
+from array import array
+from collections import Counter
+from multiprocessing import Pool
+import numpy as np
+
+from out_of_core import iter_jsonl_sources, scan_corpus, train_split
+from preprocess_bbc_dataset import (CATEGORIES, VOCAB_SIZE, DOC_CHUNK_SIZE, SEED,
+                                    corpus_jobs, iter_file_tokens)
+from shards import CountShard, merge_shards, save_shard, load_shard
+from sparse_dataset import (load_sparse_dataset, dataset_filename, take_rows, class_counts,
+                            PREPROCESSED_DIR)
+from train_model import write_model, write_mmap
+
+SHARD_DIR = os.path.join("Analizador", "shards")
+PLAN_FORMAT = 'shard-plan-v1'
+
+def shard_path(shard_dir, index, n_shards):
+    return os.path.join(shard_dir, f"shard-{index:05d}-of-{n_shards:05d}.npz")
+
+def plan_path(shard_dir):
+    return os.path.join(shard_dir, "plan.npz")
+
+def iter_source(source, start=0, stop=None, workers=1):
+    """(categoría, tokens) de los registros [start, stop) de la fuente: archivos de
+    DataSet en el orden de train_model.py --raw, o líneas no vacías del JSONL"""
+    kind, value = source
+    if kind == 'raw':
+        return iter_file_tokens(corpus_jobs()[start:stop], workers)
+    return iter_jsonl_sources(value, start=start, stop=stop)
+
+def plan_corpus(source, vocab_size=VOCAB_SIZE, chunk_size=DOC_CHUNK_SIZE, seed=SEED, workers=1):
+    """Primera pasada sobre el texto (la de train_out_of_core): vocabulario, documentos
+    por categoría y posición de cada registro dentro de su categoría. Con el plan, cada
+    shard sabe a qué pseudo-documento pertenece cada palabra sin leer lo anterior"""
+    offsets = array('q')
+    position = dict.fromkeys(CATEGORIES, 0)
+
+    def tracked(sources):
+        for category, tokens in sources:
+            offsets.append(position[category])
+            position[category] += len(tokens)
+            yield category, tokens
+
+    vocabulary, doc_counts = scan_corpus(tracked(iter_source(source, workers=workers)),
+                                         CATEGORIES, vocab_size, chunk_size)
+    return {'options': {'source': list(source), 'vocab_size': vocab_size,
+                        'chunk_size': chunk_size, 'seed': seed},
+            'vocabulary': vocabulary, 'doc_counts': doc_counts,
+            'offsets': np.frombuffer(offsets, dtype=np.int64)}
+
+def save_plan(path, plan):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f,
+                            format=np.array(PLAN_FORMAT),
+                            options=np.array(json.dumps(plan['options'], sort_keys=True)),
+                            vocabulary=np.array(plan['vocabulary'], dtype=str),
+                            doc_counts=np.asarray(plan['doc_counts'], dtype=np.int64),
+                            offsets=plan['offsets'])
+    os.replace(tmp_path, path)
+
+def load_plan(path, options):
+    """Plan guardado con las mismas opciones; None si no existe o es de otra corrida"""
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as npz:
+        if str(npz['format']) != PLAN_FORMAT or \
+                json.loads(str(npz['options'])) != json.loads(json.dumps(options)):
+            return None
+        return {'options': options, 'vocabulary': npz['vocabulary'].tolist(),
+                'doc_counts': npz['doc_counts'].tolist(), 'offsets': npz['offsets']}
+
+def count_items(source, start, stop, plan):
+    """Conteos de los documentos de entrenamiento en los registros [start, stop). Un
+    pseudo-documento puede repartirse entre dos shards: sus palabras se cuentan donde
+    aparecen y el documento, en el shard donde empieza"""
+    options = plan['options']
+    chunk_size = options['chunk_size']
+    vocabulary = set(plan['vocabulary'])
+    is_train, _ = train_split(plan['doc_counts'], options['seed'])
+    doc_offsets = dict(zip(CATEGORIES, np.concatenate(([0], np.cumsum(plan['doc_counts'])[:-1]))))
+
+    counters = {}
+    doc_counts = {}
+    for item, (category, tokens) in enumerate(iter_source(source, start, stop), start):
+        positions = plan['offsets'][item] + np.arange(len(tokens))
+        train = is_train[doc_offsets[category] + positions // chunk_size]
+        if not train.any():
+            continue
+        counters.setdefault(category, Counter()).update(
+            word for word, keep in zip(tokens, train) if keep and word in vocabulary)
+        doc_counts[category] = doc_counts.get(category, 0) + \
+            int(np.count_nonzero(train & (positions % chunk_size == 0)))
+    return CountShard.from_counters(counters, doc_counts)
+
+def in_category_order(shard, categories):
+    """Shard con las filas en el orden dado (el de train_split: primera aparición de
+    cada clase entre los documentos de entrenamiento, como NaiveBayesClassifier)"""
+    rows = [shard.categories.index(category) for category in categories]
+    return CountShard(categories, shard.vocabulary, shard.word_counts[rows], shard.doc_counts[rows])
+
+def build_shard(source, index, n_shards, plan=None):
+    """Cuenta la parte index de n_shards del corpus. Cada fuente se reparte de forma
+    determinista, así que el shard se puede calcular en cualquier proceso o máquina.
+    --raw y --jsonl necesitan el plan de plan_corpus"""
+    kind, value = source
+    if kind == 'data':
+        sparse = load_sparse_dataset(value)
+        if sparse.hashing:
+            raise ValueError("Los datasets con hashing se entrenan con train_model.py")
+        rows = np.array_split(np.arange(len(sparse)), n_shards)[index]
+        part = take_rows(sparse, rows)
+        categories = list(dict.fromkeys(part.labels))
+        word_counts, doc_counts = class_counts(part, categories)
+        # Solo las palabras que aparecen en esta parte
+        seen = word_counts.sum(axis=0) > 0
+        vocabulary = np.asarray(part.vocabulary, dtype=str)[seen]
+        order = np.argsort(vocabulary)
+        return CountShard(categories, vocabulary[order], word_counts[:, seen][:, order],
+                          doc_counts)
+
+    if kind in ('raw', 'jsonl'):
+        # Registros contiguos: cada shard lee solo su parte de los archivos o líneas
+        n_items = len(plan['offsets'])
+        start, stop = n_items * index // n_shards, n_items * (index + 1) // n_shards
+        return count_items(source, start, stop, plan)
+
+    raise ValueError(f"Fuente desconocida: {kind}")
+
+def write_shard(task):
+    source, index, n_shards, shard_dir, plan = task
+    start = time.perf_counter()
+    shard = build_shard(source, index, n_shards, plan)
+    path = shard_path(shard_dir, index, n_shards)
+    save_shard(path, shard)
+    return path, int(shard.doc_counts.sum()), time.perf_counter() - start
+
+def reduce_shards(shard_dir, n_shards=None):
+    """Combina los shards del directorio (todos los de la misma corrida) en uno"""
+    paths = sorted(glob.glob(os.path.join(shard_dir, "shard-*-of-*.npz")))
+    if n_shards is not None:
+        paths = [path for path in paths if path.endswith(f"-of-{n_shards:05d}.npz")]
+        if len(paths) != n_shards:
+            raise ValueError(f"Se esperaban {n_shards} shards en {shard_dir}, hay {len(paths)}")
+    if not paths:
+        raise ValueError(f"No hay shards en {shard_dir}")
+    return merge_shards(load_shard(path) for path in paths)
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Entrenamiento en paralelo por shards de conteos + reducción a un modelo")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--data", default="train_dataset",
+                        help="dataset preprocesado en Analizador/preprocessed (sin extensión)")
+    source.add_argument("--raw", action="store_true",
+                        help="cuenta directamente los archivos de DataSet (mismos pseudo-documentos "
+                             "y división train/test que train_model.py --raw)")
+    source.add_argument("--jsonl", metavar="ARCHIVO",
+                        help='JSONL con {"text", "category"} por línea')
+    parser.add_argument("--shards", type=int, default=os.cpu_count(),
+                        help="número de partes en que se divide el corpus")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="procesos que calculan shards en paralelo")
+    parser.add_argument("--shard-index", type=int,
+                        help="calcula solo este shard y termina (varias máquinas, disco compartido)")
+    parser.add_argument("--reduce-only", action="store_true",
+                        help="no cuenta nada: combina los shards ya escritos en --shard-dir")
+    parser.add_argument("--shard-dir", default=SHARD_DIR)
+    parser.add_argument("--vocab-size", type=int,
+                        help=f"palabras más frecuentes a conservar (por defecto {VOCAB_SIZE} con "
+                             "--raw/--jsonl; sin corte con --data)")
+    parser.add_argument("--chunk-size", type=int, default=DOC_CHUNK_SIZE,
+                        help="con --raw/--jsonl, palabras por pseudo-documento")
+    parser.add_argument("--seed", type=int, default=SEED,
+                        help="con --raw/--jsonl, semilla de la división train/test")
+    parser.add_argument("--alpha", type=float, default=1.0)
+    parser.add_argument("--mmap", action="store_true",
+                        help="exporta también el modelo para carga con mmap (bbc_classifier.mmap/)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    print("----------------ENTRENAMIENTO POR SHARDS----------------")
+
+    if args.raw:
+        source = ('raw', None)
+    elif args.jsonl:
+        source = ('jsonl', args.jsonl)
+    else:
+        source = ('data', os.path.join(PREPROCESSED_DIR, dataset_filename(args.data)))
+    vocab_size = args.vocab_size
+    if vocab_size is None and source[0] != 'data':
+        vocab_size = VOCAB_SIZE
+
+    try:
+        os.makedirs(args.shard_dir, exist_ok=True)
+        plan = None
+        if source[0] != 'data':
+            # El plan se calcula en la corrida completa; con --shard-index o --reduce-only
+            # se reutiliza el del directorio compartido si tiene las mismas opciones
+            options = {'source': list(source), 'vocab_size': vocab_size,
+                       'chunk_size': args.chunk_size, 'seed': args.seed}
+            if args.shard_index is not None or args.reduce_only:
+                plan = load_plan(plan_path(args.shard_dir), options)
+            if plan is None:
+                if args.reduce_only:
+                    raise ValueError(f"No hay un plan con estas opciones en {args.shard_dir}")
+                print("Primera pasada: vocabulario y documentos...")
+                plan = plan_corpus(source, vocab_size, args.chunk_size, args.seed, args.workers)
+                save_plan(plan_path(args.shard_dir), plan)
+        tasks = [(source, index, args.shards, args.shard_dir, plan) for index in range(args.shards)]
+
+        if args.shard_index is not None:
+            if not 0 <= args.shard_index < args.shards:
+                raise ValueError(f"--shard-index debe estar entre 0 y {args.shards - 1}")
+            path, docs, seconds = write_shard(tasks[args.shard_index])
+            print(f"Shard {args.shard_index}: {docs} documentos en {seconds:.1f} s -> {path}")
+            return
+
+        start = time.perf_counter()
+        if not args.reduce_only:
+            # Se eliminan los shards de corridas anteriores con otro número de partes
+            for old_path in glob.glob(os.path.join(args.shard_dir, "shard-*-of-*.npz")):
+                os.remove(old_path)
+            print(f"Calculando {args.shards} shards con {args.workers} procesos...")
+            if args.workers > 1:
+                with Pool(args.workers) as pool:
+                    results = pool.map(write_shard, tasks, chunksize=1)
+            else:
+                results = [write_shard(task) for task in tasks]
+            for path, docs, seconds in results:
+                print(f"- {os.path.basename(path)}: {docs} documentos en {seconds:.1f} s")
+        counted = time.perf_counter()
+
+        print("Combinando shards...")
+        merged = reduce_shards(args.shard_dir, None if args.reduce_only else args.shards)
+        if plan is None:
+            model = merged.top_words(vocab_size).to_model(args.alpha)
+        else:
+            # El vocabulario ya viene del plan (frecuencias de todo el corpus, como --raw)
+            _, category_order = train_split(plan['doc_counts'], args.seed)
+            categories = [CATEGORIES[row] for row in category_order]
+            model = in_category_order(merged, categories).to_model(args.alpha)
+        finished = time.perf_counter()
+
+        model_path = os.path.join("Analizador", "bbc_classifier.pkl")
+        write_model(model, model_path)
+        print(f"\n{len(model.categories)} categorías, {len(model.vocabulary)} palabras, "
+              f"{int(model.doc_counts.sum())} documentos")
+        print(f"Conteo: {counted - start:.1f} s   Reducción: {finished - counted:.1f} s")
+        print(f"Modelo guardado en: {model_path}")
+
+        if args.mmap:
+            write_mmap(model, model_path)
+
+    except Exception as e:
+        print(f"\nERROR: {str(e)}")
+
+if __name__ == '__main__':
+    main()